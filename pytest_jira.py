@@ -8,19 +8,76 @@ You must set the url either at the command line or in jira.cfg.
 Author: James Laska
 """
 
+import collections
+import configparser
+import contextlib
+import functools
+import gzip
+import http
+import importlib
+import itertools
+import json
+import logging
+import math
 import os
+import random
 import re
+import shutil
 import sys
+import tempfile
+import threading
+import time
+import warnings
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 from json import JSONDecodeError
 
 import pytest
-import requests
-import six
-import urllib3
-from packaging.version import Version
-from retry import retry
 
-from issue_model import JiraIssue, JiraIssueSchema
+
+class _LazyModule(object):
+    """
+    Stand-in for a module which is imported on the first attribute access,
+    the module then replaces the stand-in in the namespace of the plugin.
+    Keeps the import of the plugin cheap in sessions which do not use it.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        # Do not import on introspection, e.g. by pytest looking for fixtures
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        module = importlib.import_module(self._name)
+        globals()[self._name] = module
+        return getattr(module, attr)
+
+
+asyncio = _LazyModule("asyncio")
+hashlib = _LazyModule("hashlib")
+issue_model = _LazyModule("issue_model")
+requests = _LazyModule("requests")
+retry = _LazyModule("retry")
+sqlite3 = _LazyModule("sqlite3")
+ssl = _LazyModule("ssl")
+urllib3 = _LazyModule("urllib3")
+
+
+def _json_loads(data):
+    """
+    Decode JSON by orjson when it is installed.  The decoder is looked up on
+    the first call, which replaces this function.
+    """
+    global _json_loads
+    try:
+        # Optional faster JSON decoder, raises a subclass of JSONDecodeError
+        from orjson import loads as _json_loads
+    except ImportError:
+        _json_loads = json.loads
+    return _json_loads(data)
+
 
 DEFAULT_RESOLVE_STATUSES = "closed", "resolved"
 DEFAULT_RUN_TEST_CASE = True
@@ -34,6 +91,95 @@ URL_ENV_VAR = "PYTEST_JIRA_URL"
 PASSWORD_ENV_VAR = "PYTEST_JIRA_PASSWORD"
 USERNAME_ENV_VAR = "PYTEST_JIRA_USERNAME"
 TOKEN_ENV_VAR = "PYTEST_JIRA_TOKEN"
+# Parsed jira.cfg passed from the xdist controller to its workers, without
+# the credentials which are passed by the workerinput instead
+CONFIG_CACHE_ENV_VAR = "PYTEST_JIRA_CONFIG_CACHE"
+CONFIG_SECRETS = "username", "password", "token"
+# Limits for batched JQL searches, keep both the number of keys (maxResults)
+# and the length of the query string within what Jira accepts
+SEARCH_MAX_RESULTS = 100
+SEARCH_MAX_JQL_LENGTH = 2000
+DEFAULT_ASYNC_CONCURRENCY = 20
+# Jira fields needed to evaluate the markers
+ISSUE_FIELDS = "components", "versions", "fixVersions", "status", "resolution"
+# Fields of a parsed issue which are stored as sets
+ISSUE_SET_FIELDS = "components", "versions", "fixed_versions"
+ISSUE_RECORD_FIELDS = ISSUE_SET_FIELDS + ("status", "resolution")
+# How long xdist workers wait for the issues resolved by another worker
+SHARED_ISSUES_TIMEOUT = 600
+SNAPSHOT_SCHEMA_VERSION = 1
+# Version of the tables of the persistent cache, older ones are recreated
+CACHE_SCHEMA_VERSION = 1
+# Responses remembered by the persistent negative cache
+NEGATIVE_CACHE_STATUSES = 404, 403
+# Retries of responses which are not valid JSON, e.g. truncated ones
+JSON_RETRY_TRIES = 3
+JSON_RETRY_DELAY = 2
+# Circuit breaker defaults, the error rate is taken over the last
+# BREAKER_WINDOW requests
+DEFAULT_BREAKER_FAILURES = 5
+DEFAULT_BREAKER_ERROR_RATE = 0.5
+DEFAULT_BREAKER_RESET_TIMEOUT = 30
+BREAKER_WINDOW = 20
+# Seconds all requests are held back after a 429 without Retry-After, pauses
+# are stretched by up to RATE_LIMIT_JITTER so CI jobs throttled at the same
+# time do not all come back at once
+DEFAULT_THROTTLE_PAUSE = 1
+RATE_LIMIT_JITTER = 0.1
+# Seconds between checks of a full rate limiter on the asyncio event loop
+RATE_LIMIT_POLL_INTERVAL = 0.01
+# Number of the slowest requests listed in the terminal summary
+STATS_SLOWEST = 5
+# Counters of JiraStats summed up over the xdist workers
+STATS_COUNTERS = (
+    "requests",
+    "retries",
+    "errors",
+    "not_found",
+    "bytes_received",
+    "cache_hits",
+    "cache_misses",
+    "throttled",
+)
+
+
+class JiraIssueRecord(Mapping):
+    """
+    Compact read-only parsed issue.  Names are interned and equal sets of
+    names are shared between issues.  Supports the dict-style access of a
+    parsed issue, e.g. ``issue["components"]`` or ``issue.get("status")``.
+    """
+
+    __slots__ = ISSUE_RECORD_FIELDS
+    _sets = {}
+
+    def __init__(
+        self, components, versions, fixed_versions, status, resolution
+    ):
+        self.components = self._shared(components)
+        self.versions = self._shared(versions)
+        self.fixed_versions = self._shared(fixed_versions)
+        self.status = _intern(status)
+        self.resolution = _intern(resolution)
+
+    @classmethod
+    def _shared(cls, names):
+        names = frozenset(sys.intern(name) for name in names)
+        return cls._sets.setdefault(names, names)
+
+    def __getitem__(self, key):
+        if key not in ISSUE_RECORD_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(ISSUE_RECORD_FIELDS)
+
+    def __len__(self):
+        return len(ISSUE_RECORD_FIELDS)
+
+    def __repr__(self):
+        return "JiraIssueRecord(%r)" % dict(self)
 
 
 class JiraHooks(object):
@@ -49,6 +195,18 @@ class JiraHooks(object):
         strict_xfail=False,
         connection_error_strategy=None,
         return_jira_metadata=False,
+        prefetch=True,
+        workers=1,
+        async_fetcher=None,
+        disk_cache=None,
+        shared_dir=None,
+        cache_refresh=False,
+        snapshot_path=None,
+        stats=None,
+        stats_threshold=None,
+        tracer=None,
+        resolve_after_deselect=False,
+        fetch_during_collection=False,
     ):
         self.conn = connection
         self.mark = marker
@@ -66,31 +224,554 @@ class JiraHooks(object):
         self.connection_error_strategy = connection_error_strategy
         # Speed up JIRA lookups for duplicate issues
         self.issue_cache = dict()
+        # HTTP status of issues not found or not accessible by issue ID,
+        # loaded from the persistent cache
+        self._missing = dict()
+        # HTTP status (None without a response) and message of failed
+        # lookups by issue ID, shared by the xdist worker resolving issues
+        self._errors = dict()
+        # Verdicts by issue ID, together with the evaluated issue_cache entry
+        self._verdicts = dict()
+        # Marks added to the items of unresolved issues
+        self._run_marks = dict()
+        self._has_closest_marker = _has_closest_marker()
 
         self.strict_xfail = strict_xfail
         self.return_jira_metadata = return_jira_metadata
+        self.prefetch = prefetch
+        self.workers = workers
+        self.async_fetcher = async_fetcher
+        self.disk_cache = disk_cache
+        self.cache_refresh = cache_refresh
+        # Path to write a snapshot of the issue cache to after collection
+        self.snapshot_path = snapshot_path
+        # Issues are read from a snapshot and never fetched from Jira
+        self.offline = False
+        # Directory shared by xdist workers, created by the controller
+        self.shared_dir = shared_dir
+        self._owns_shared_dir = False
+        # JiraStats of the session, None unless statistics are enabled
+        self.stats = stats
+        # Seconds after which a slow Jira phase is reported by a warning
+        self.stats_threshold = stats_threshold
+        self.tracer = tracer
+        # Resolve issues after collection finished instead of in
+        # pytest_collection_modifyitems, only for the items left to run
+        self.resolve_after_deselect = resolve_after_deselect
+        # Fetch issues in a background thread while items are collected
+        self.fetch_during_collection = fetch_during_collection
+        self._executor = None
+        self._background = []
+        self._pending = []
+        self._dispatched = set()
+        # Time the issues served from the expired persistent cache were
+        # fetched by issue ID, they are revalidated in the background
+        self._stale = dict()
+        self._revalidator = None
+        if tracer:
+            # Lookups are only wrapped when tracing, they are called per item
+            self._resolve_issue = self.is_issue_resolved
+            self.is_issue_resolved = self._traced_is_issue_resolved
+
+    def _store(self, issues):
+        self.issue_cache.update(issues)
+        if self.disk_cache and self.disk_cache.ttl:
+            self.disk_cache.set_many(
+                self.conn.get_url(), issues, self.return_jira_metadata
+            )
+
+    def load_cached_issues(self, issue_ids):
+        """
+        Populate the issue cache from the persistent cache for all not yet
+        cached issue IDs which did not expire.  With a hard TTL, expired
+        issues within it are used as well and revalidated in the background.
+        """
+        if not (self.disk_cache and self.disk_cache.ttl):
+            return
+        missing = set(i for i in issue_ids if i not in self.issue_cache)
+        if not missing:
+            return
+        url = self.conn.get_url()
+        self.issue_cache.update(
+            self.disk_cache.get_many(url, missing, self.return_jira_metadata)
+        )
+        missing.difference_update(self.issue_cache)
+        if not (missing and self.disk_cache.hard_ttl and not self.offline):
+            return
+        stale = self.disk_cache.get_stale(
+            url, missing, self.return_jira_metadata
+        )
+        if stale:
+            for issue_id, (issue, fetched) in stale.items():
+                self.issue_cache[issue_id] = issue
+                self._stale[issue_id] = fetched
+            try:
+                # Authenticate once, not by the revalidation and the lookups
+                # of this thread at the same time
+                if not self.conn.is_connected:
+                    self.conn.check_connection()
+            except requests.RequestException:
+                return
+            if self._revalidator is None:
+                self._revalidator = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="jira-revalidate"
+                )
+            self._revalidator.submit(self.revalidate_stale_issues, stale)
+
+    def load_missing_issues(self, issue_ids):
+        """
+        Load the issue IDs remembered by the persistent cache as not found
+        or not accessible.  Returns the given issue IDs which are not known
+        to be missing.
+        """
+        if not (self.disk_cache and self.disk_cache.negative_ttl):
+            return issue_ids
+        unknown = set(
+            i
+            for i in issue_ids
+            if i not in self.issue_cache and i not in self._missing
+        )
+        if unknown:
+            self._missing.update(
+                self.disk_cache.get_missing(self.conn.get_url(), unknown)
+            )
+        return [i for i in issue_ids if i not in self._missing]
+
+    def _remember_missing(self, issue_id, exc):
+        status = getattr(exc.response, "status_code", None)
+        if (
+            self.disk_cache
+            and self.disk_cache.negative_ttl
+            and status in NEGATIVE_CACHE_STATUSES
+        ):
+            self.disk_cache.set_missing(self.conn.get_url(), {issue_id: status})
+
+    def load_snapshot(self, header, issues):
+        """
+        Populate the issue cache from a snapshot and stop fetching issues
+        from Jira.
+        """
+        if bool(header["metadata"]) != bool(self.return_jira_metadata):
+            raise ValueError(
+                "Configuration error: snapshot was written %s "
+                "--jira-return-metadata."
+                % ("with" if header["metadata"] else "without")
+            )
+        for issue_id, issue in issues:
+            self.issue_cache[issue_id] = _restore_issue(
+                issue, self.return_jira_metadata
+            )
+        self.offline = True
+
+    def write_snapshot(self, path):
+        """
+        Write the issue cache to a gzip compressed JSON lines file.  The
+        first line is a header with the schema version and creation time.
+        """
+        header = {
+            "schema_version": SNAPSHOT_SCHEMA_VERSION,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "url": self.conn.get_url(),
+            "metadata": bool(self.return_jira_metadata),
+        }
+        # xdist workers may write the same snapshot at once
+        tmp_path = "%s.%d.tmp" % (path, os.getpid())
+        with gzip.open(tmp_path, "wt") as f:
+            f.write(json.dumps(header) + "\n")
+            for issue_id, issue in list(self.issue_cache.items()):
+                f.write(_dump({"issue_id": issue_id, "issue": issue}) + "\n")
+        os.replace(tmp_path, path)
+
+    def refresh_cached_issues(self, issue_ids):
+        """
+        Revalidate expired issues of the persistent cache with batched
+        searches for issues updated since they were fetched.  Only changed
+        issues are returned by Jira, the others are used from the cache if a
+        search for their keys confirms they still exist.
+        """
+        if not (self.disk_cache and self.cache_refresh):
+            return
+        url = self.conn.get_url()
+        expired = self.disk_cache.get_expired(
+            url,
+            set(i for i in issue_ids if i not in self.issue_cache),
+            self.return_jira_metadata,
+        )
+        for chunk in _chunks(sorted(expired)):
+            started = time.time()
+            try:
+                updated = self.conn.get_issues(
+                    chunk,
+                    self.return_jira_metadata,
+                    updated_since=min(expired[i][1] for i in chunk),
+                )
+                unchanged = self._confirm_unchanged(chunk, updated, expired)
+            except requests.RequestException:
+                return
+            # Issues which may be deleted or moved are fetched as usual
+            self.issue_cache.update(unchanged)
+            self.disk_cache.set_many(
+                url, unchanged, self.return_jira_metadata, started
+            )
+            self._store(updated)
+
+    def revalidate_stale_issues(self, stale):
+        """
+        Fetch the issues served stale, given as a dict of tuples of the issue
+        and the time it was fetched, and update them in the persistent cache
+        for the next session.  The issue cache is left as it is, so all items
+        of this session see the same state.  With `cache_refresh` only the
+        issues updated since they were fetched are transferred.  Issues
+        missing from the searches are fetched one by one and dropped from the
+        persistent cache if they were not found.
+        """
+        url = self.conn.get_url()
+        for chunk in _chunks(sorted(stale)):
+            started = time.time()
+            try:
+                issues = self.conn.get_issues(
+                    chunk,
+                    self.return_jira_metadata,
+                    updated_since=(
+                        min(stale[i][1] for i in chunk)
+                        if self.cache_refresh
+                        else None
+                    ),
+                )
+                unchanged = (
+                    self._confirm_unchanged(chunk, issues, stale)
+                    if self.cache_refresh
+                    else {}
+                )
+            except requests.RequestException:
+                return
+            self.disk_cache.set_many(
+                url, unchanged, self.return_jira_metadata, started
+            )
+            self.disk_cache.set_many(
+                url, issues, self.return_jira_metadata, started
+            )
+            for issue_id in chunk:
+                if issue_id not in issues and issue_id not in unchanged:
+                    self._revalidate_missing(url, issue_id, started)
+
+    def _confirm_unchanged(self, issue_ids, updated, cached):
+        """
+        Returns the cached issues, given as a dict of tuples of the issue and
+        the time it was fetched, which were not updated and still exist.  A
+        search for updated issues does not return deleted, moved or hidden
+        issues either, so they are confirmed by a search for their keys.
+        """
+        candidates = [i for i in issue_ids if i not in updated]
+        if not candidates:
+            return {}
+        existing = self.conn.get_existing_keys(candidates)
+        return dict((i, cached[i][0]) for i in candidates if i in existing)
+
+    def _revalidate_missing(self, url, issue_id, started):
+        try:
+            issue = self.conn.get_issue(issue_id, self.return_jira_metadata)
+        except requests.RequestException as e:
+            self._remember_missing(issue_id, e)
+            if _is_not_found(e):
+                self.disk_cache.delete_many(url, [issue_id])
+            return
+        self.disk_cache.set_many(
+            url, {issue_id: issue}, self.return_jira_metadata, started
+        )
+
+    def prefetch_issues(self, issue_ids):
+        """
+        Populate the issue cache for all not yet cached issue IDs using
+        batched JQL searches.  Issues missing from the search results are
+        left to be fetched one by one by `is_issue_resolved`.
+        """
+        missing = sorted(set(i for i in issue_ids if i not in self.issue_cache))
+        for chunk in _chunks(missing):
+            try:
+                self._store(
+                    self.conn.get_issues(chunk, self.return_jira_metadata)
+                )
+            except requests.RequestException:
+                # Search may be unavailable, fall back to single lookups
+                return
+
+    def fetch_issues(self, issue_ids):
+        """
+        Fetch all not yet cached issue IDs concurrently, either on the
+        asyncio engine or using a pool of `workers` threads.  Failed lookups
+        are left uncached, so they are retried and reported by
+        `is_issue_resolved`.
+        """
+        missing = sorted(set(i for i in issue_ids if i not in self.issue_cache))
+        if not missing:
+            return
+        try:
+            # Authenticate once instead of for every issue
+            if not self.conn.is_connected:
+                self.conn.check_connection()
+        except requests.RequestException:
+            return
+        if self.async_fetcher:
+            results = self.async_fetcher.fetch(
+                missing, self.return_jira_metadata
+            )
+        else:
+            results = self._fetch_threaded(missing)
+        for issue_id in missing:
+            result = results[issue_id]
+            if not isinstance(result, Exception):
+                self._store({issue_id: result})
+            else:
+                self._remember_missing(issue_id, result)
+                if _is_not_found(result):
+                    self.issue_cache[issue_id] = self.mark.get_default(issue_id)
+
+    def _fetch_threaded(self, issue_ids):
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = dict(
+                (
+                    executor.submit(
+                        self.conn.get_issue, issue_id, self.return_jira_metadata
+                    ),
+                    issue_id,
+                )
+                for issue_id in issue_ids
+            )
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except requests.RequestException as e:
+                    results[futures[future]] = e
+        return results
+
+    def resolve_issues(self, issue_ids):
+        """
+        Populate the issue cache for all given issue IDs, using the
+        persistent cache, batched searches and concurrent fetching.
+        """
+        with _span(self.tracer, "load_missing_issues", "cache"):
+            issue_ids = self.load_missing_issues(issue_ids)
+        with _span(self.tracer, "load_cached_issues", "cache"):
+            self.load_cached_issues(issue_ids)
+        with _span(self.tracer, "refresh_cached_issues", "cache"):
+            self.refresh_cached_issues(issue_ids)
+        if self.prefetch:
+            with _span(self.tracer, "prefetch_issues", "resolve"):
+                self.prefetch_issues(issue_ids)
+        if self.workers > 1 or self.async_fetcher:
+            with _span(self.tracer, "fetch_issues", "resolve"):
+                self.fetch_issues(issue_ids)
+
+    def resolve_shared_issues(self, issue_ids):
+        """
+        Resolve the issues once for all xdist workers.  All workers collect
+        the same items, the first one to get here resolves the issues and
+        publishes them in the shared directory, other workers wait for them.
+        Lookups which failed are published with their error, so the other
+        workers do not request them again.
+        """
+        if not os.path.isdir(self.shared_dir):
+            # Worker on another host than the controller, e.g. --tx ssh=...
+            self.resolve_issues(issue_ids)
+            return
+        published = os.path.join(self.shared_dir, "issues.json")
+        lock = os.path.join(self.shared_dir, "lock")
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            deadline = time.time() + SHARED_ISSUES_TIMEOUT
+            while (
+                not os.path.exists(published)
+                and time.time() < deadline
+                and _lock_owner_alive(lock)
+            ):
+                time.sleep(0.1)
+            if os.path.exists(published):
+                with open(published) as f:
+                    shared = json.load(f)
+                for issue_id, issue in shared["issues"].items():
+                    self.issue_cache.setdefault(
+                        issue_id,
+                        _restore_issue(issue, self.return_jira_metadata),
+                    )
+                self._errors.update(
+                    (issue_id, tuple(error))
+                    for issue_id, error in shared["errors"].items()
+                )
+            # Only when the other worker did not finish, e.g. it crashed
+            self.resolve_issues([i for i in issue_ids if i not in self._errors])
+            return
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        try:
+            self.resolve_issues(issue_ids)
+            self._fetch_remaining(issue_ids)
+        finally:
+            shared = {
+                "issues": dict(
+                    (issue_id, self.issue_cache[issue_id])
+                    for issue_id in issue_ids
+                    if issue_id in self.issue_cache
+                ),
+                "errors": self._errors,
+            }
+            with open(published + ".tmp", "w") as f:
+                f.write(_dump(shared))
+            os.replace(published + ".tmp", published)
+
+    def _fetch_remaining(self, issue_ids):
+        """
+        Fetch the issues left unresolved by `resolve_issues` one by one and
+        keep the errors of the failed lookups.
+        """
+        remaining = sorted(
+            i
+            for i in issue_ids
+            if i not in self.issue_cache and i not in self._missing
+        )
+        for issue_id in remaining:
+            try:
+                self._fetch_issue(issue_id)
+            except requests.RequestException as e:
+                error = getattr(e.response, "status_code", None), str(e)
+                self._errors[issue_id] = error
+                if not self.conn.is_connected:
+                    # Failed authentication, the same for all issues
+                    for i in remaining:
+                        if i not in self.issue_cache:
+                            self._errors.setdefault(i, error)
+                    return
+
+    def _fetch_issue(self, issue_id):
+        """
+        Fetch a single issue into the issue cache.
+        """
+        if not self.conn.is_connected:
+            # Failed authentication is not remembered for the issue
+            self.conn.check_connection()
+        try:
+            self._store(
+                {
+                    issue_id: self.conn.get_issue(
+                        issue_id, self.return_jira_metadata
+                    )
+                }
+            )
+        except requests.RequestException as e:
+            self._remember_missing(issue_id, e)
+            raise
+
+    def pytest_itemcollected(self, item):
+        if not self.fetch_during_collection or self.offline or self.shared_dir:
+            return
+        try:
+            jira_ids = self.mark.get_jira_issues(item)
+        except Exception:
+            # Reported by pytest_collection_modifyitems
+            return
+        for issue_id, _ in jira_ids:
+            if issue_id not in self._dispatched:
+                self._dispatched.add(issue_id)
+                self._pending.append(issue_id)
+        # Send a full search, or whatever was found while the thread was busy
+        if self._pending and (
+            len(self._pending) >= SEARCH_MAX_RESULTS
+            or not self._background
+            or self._background[-1].done()
+        ):
+            self._dispatch_pending()
+
+    def _dispatch_pending(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="jira-fetch"
+            )
+        self._background.append(
+            self._executor.submit(self.resolve_issues, self._pending)
+        )
+        self._pending = []
+
+    def finish_background_fetch(self):
+        """
+        Dispatch the issues collected since the last background fetch and
+        wait for all background fetches to finish.
+        """
+        if self._pending:
+            self._dispatch_pending()
+        with _span(self.tracer, "finish_background_fetch", "resolve"):
+            for future in self._background:
+                future.result()
+        self._background = []
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_configure_node(self, node):
+        """
+        Executed on the xdist controller, pass the shared directory to the
+        workers.
+        """
+        if not self.shared_dir:
+            self.shared_dir = tempfile.mkdtemp(prefix="pytest-jira-")
+            self._owns_shared_dir = True
+        node.workerinput["jira_shared_dir"] = self.shared_dir
 
     def is_issue_resolved(self, issue_id):
         """
         Returns whether the provided issue ID is resolved (True|False).  Will
         cache issues to speed up subsequent calls for the same issue.
         """
+        if self.stats:
+            self.stats.record_lookup(issue_id in self.issue_cache)
         # Access Jira issue (may be cached)
+        if issue_id not in self.issue_cache and self.offline:
+            self.issue_cache[issue_id] = self.mark.get_default(issue_id)
         if issue_id not in self.issue_cache:
-            try:
-                self.issue_cache[issue_id] = self.conn.get_issue(
-                    issue_id, self.return_jira_metadata
+            self.load_cached_issues([issue_id])
+        if issue_id not in self.issue_cache and not self.load_missing_issues(
+            [issue_id]
+        ):
+            # Not found or not accessible according to the persistent cache
+            status = self._missing[issue_id]
+            if status != 404:
+                raise _http_error(
+                    status,
+                    "%s (remembered by the persistent cache)"
+                    % http.HTTPStatus(status).phrase,
+                    "{url}/rest/api/2/issue/{issue_id}".format(
+                        url=self.conn.get_url(), issue_id=issue_id
+                    ),
                 )
+            self.issue_cache[issue_id] = self.mark.get_default(issue_id)
+        if issue_id not in self.issue_cache:
+            try:
+                if issue_id in self._errors:
+                    # Failed lookup of the xdist worker which resolved issues
+                    raise _shared_error(*self._errors[issue_id])
+                self._fetch_issue(issue_id)
             except requests.RequestException as e:
-                if (
-                    not hasattr(e.response, "status_code")
-                    or not e.response.status_code == 404
-                ):
+                if not _is_not_found(e):
                     raise
                 self.issue_cache[issue_id] = self.mark.get_default(issue_id)
+
+        # Reuse the verdict while the cached issue was not replaced
+        issue = self.issue_cache[issue_id]
+        verdict = self._verdicts.get(issue_id)
+        if verdict is None or verdict[0] is not issue:
+            verdict = (issue, self._evaluate(issue_id))
+            self._verdicts[issue_id] = verdict
+        return verdict[1]
+
+    def _traced_is_issue_resolved(self, issue_id):
+        with self.tracer.span(
+            "lookup %s" % issue_id, "cache", hit=issue_id in self.issue_cache
+        ):
+            return self._resolve_issue(issue_id)
+
+    def _evaluate(self, issue_id):
         if self.return_jira_metadata:
-            issue = JiraIssueSchema().dump(self.issue_cache[issue_id])
-            return JiraIssue(issue_id, **issue)
+            issue = _issue_schema().dump(self.issue_cache[issue_id])
+            return issue_model.JiraIssue(issue_id, **issue)
 
         # Skip test if issue remains unresolved
         if self.issue_cache[issue_id] is None:
@@ -107,18 +788,66 @@ class JiraHooks(object):
             return not self.is_affected(issue_id)
 
     def get_marker(self, item):
-        if Version(pytest.__version__) >= Version("3.6.0"):
+        if self._has_closest_marker:
             return item.get_closest_marker("jira")
         else:
             return item.keywords.get("jira")
 
+    def _get_run_mark(self, issue_id, jira_run):
+        """
+        Returns the xfail (or skip) mark for an unresolved issue, built once
+        for all items referencing the issue.
+        """
+        key = issue_id, bool(jira_run)
+        mark = self._run_marks.get(key)
+        if mark is None:
+            reason = "%s/browse/%s" % (self.conn.get_url(), issue_id)
+            if jira_run:
+                mark = pytest.mark.xfail(reason=reason)
+            else:
+                mark = pytest.mark.skip(reason=reason)
+            self._run_marks[key] = mark
+        return mark
+
     def pytest_collection_modifyitems(self, config, items):
+        if not self.resolve_after_deselect:
+            self._resolve_items("pytest_collection_modifyitems", config, items)
+
+    def _resolve_items(self, hook_name, config, items):
+        start = time.perf_counter()
+        try:
+            with _span(self.tracer, hook_name, "hook", items=len(items)):
+                self._mark_items(config, items)
+        finally:
+            elapsed = time.perf_counter() - start
+            if self.stats:
+                self.stats.phase_time += elapsed
+        if self.stats_threshold is not None and elapsed > self.stats_threshold:
+            warnings.warn(
+                "Resolving Jira issues took %.2fs, more than the threshold of "
+                "%gs" % (elapsed, self.stats_threshold)
+            )
+
+    def _mark_items(self, config, items):
+        item_issues = []
         for item in items:
             try:
-                jira_ids = self.mark.get_jira_issues(item)
+                item_issues.append((item, self.mark.get_jira_issues(item)))
             except Exception as exc:
                 pytest.exit(exc)
 
+        issue_ids = set(
+            issue_id for _, jira_ids in item_issues for issue_id, _ in jira_ids
+        )
+        if self.offline:
+            pass
+        elif self.shared_dir:
+            self.resolve_shared_issues(issue_ids)
+        else:
+            self.finish_background_fetch()
+            self.resolve_issues(issue_ids)
+
+        for item, jira_ids in item_issues:
             jira_run = self.run_test_case
 
             marker = self.get_marker(item)
@@ -138,14 +867,7 @@ class JiraHooks(object):
                         else:
                             if not skipif:
                                 continue
-                        reason = "%s/browse/%s" % (
-                            self.conn.get_url(),
-                            issue_id,
-                        )
-                        if jira_run:
-                            item.add_marker(pytest.mark.xfail(reason=reason))
-                        else:
-                            item.add_marker(pytest.mark.skip(reason=reason))
+                        item.add_marker(self._get_run_mark(issue_id, jira_run))
                 except requests.RequestException as e:
                     if self.connection_error_strategy == STRICT:
                         raise
@@ -156,6 +878,67 @@ class JiraHooks(object):
                     else:
                         return
 
+    def pytest_collection_finish(self, session):
+        if self.resolve_after_deselect:
+            # Items deselected by -k, -m, --deselect or other plugins are gone
+            self._resolve_items(
+                "pytest_collection_finish", session.config, session.items
+            )
+        with _span(self.tracer, "pytest_collection_finish", "hook"):
+            if self.snapshot_path:
+                self.write_snapshot(self.snapshot_path)
+
+    def pytest_sessionfinish(self, session):
+        workeroutput = getattr(session.config, "workeroutput", None)
+        if workeroutput is None:
+            return
+        if self._revalidator:
+            # The controller may stop the worker after it finished
+            self._revalidator.shutdown()
+        # Reported by the xdist controller
+        if self.stats:
+            workeroutput["jira_stats"] = self.stats.export()
+        if self._stale:
+            workeroutput["jira_stale"] = dict(self._stale)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        """
+        Executed on the xdist controller, collect the statistics and the
+        issues served stale of the worker.
+        """
+        workeroutput = getattr(node, "workeroutput", {})
+        if self.stats and "jira_stats" in workeroutput:
+            self.stats.merge(workeroutput["jira_stats"])
+        self._stale.update(workeroutput.get("jira_stale", {}))
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if self.stats:
+            terminalreporter.write_sep("-", "Jira statistics")
+            for line in self.stats.summary():
+                terminalreporter.write_line(line)
+        if self._stale:
+            terminalreporter.write_sep("-", "Jira issues served stale")
+            now = time.time()
+            for issue_id, fetched in sorted(self._stale.items()):
+                terminalreporter.write_line(
+                    "%s fetched %.0fs ago" % (issue_id, now - fetched)
+                )
+
+    def pytest_unconfigure(self, config):
+        if self._executor:
+            self._executor.shutdown()
+        if self._revalidator:
+            # Let the refreshed issues reach the persistent cache
+            with _span(self.tracer, "revalidate_stale_issues", "cache"):
+                self._revalidator.shutdown()
+        if self.tracer:
+            self.tracer.write()
+        if self.disk_cache:
+            self.disk_cache.close()
+        if self._owns_shared_dir:
+            shutil.rmtree(self.shared_dir, ignore_errors=True)
+
     def fixed_in_version(self, issue_id):
         """
         Return True if:
@@ -193,6 +976,269 @@ class JiraHooks(object):
         return bool(self.components.intersection(affected))
 
 
+def _retry_json_errors(func):
+    """
+    Retry a request whose response is not valid JSON, e.g. a truncated one.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        return retry.retry_call(
+            func,
+            fargs=(self,) + args,
+            fkwargs=kwargs,
+            exceptions=JSONDecodeError,
+            tries=JSON_RETRY_TRIES,
+            delay=JSON_RETRY_DELAY,
+            logger=self._retry_logger,
+        )
+
+    return wrapper
+
+
+class _RetryLogger(object):
+    """
+    Logger of the retry package which also counts the retries of a
+    connection.
+    """
+
+    def __init__(self, connection):
+        self.conn = connection
+        self.logger = logging.getLogger("retry.api")
+
+    def warning(self, msg, *args):
+        self.logger.warning(msg, *args)
+        if self.conn.stats:
+            self.conn.stats.record_retry()
+        if self.conn.tracer:
+            # retry_call sleeps right after logging
+            start = time.perf_counter()
+            self.conn.tracer.add(
+                "retry backoff",
+                "retry",
+                start,
+                start + JSON_RETRY_DELAY,
+                {"reason": msg},
+            )
+
+
+@functools.lru_cache(maxsize=None)
+def _jira_retry():
+    class _JiraRetry(urllib3.Retry):
+        """
+        Retry configuration of urllib3 which traces the backoff sleeps and
+        reports the retried responses to the rate limiter.
+        """
+
+        tracer = None
+        limiter = None
+
+        def new(self, **kw):
+            retries = super(_JiraRetry, self).new(**kw)
+            retries.tracer = self.tracer
+            retries.limiter = self.limiter
+            return retries
+
+        def increment(self, method=None, url=None, response=None, *a, **kw):
+            if self.limiter and response is not None:
+                self.limiter.notify(response.status, response.headers)
+            return super(_JiraRetry, self).increment(
+                method, url, response, *a, **kw
+            )
+
+        def sleep(self, response=None):
+            if not self.tracer:
+                return super(_JiraRetry, self).sleep(response)
+            start = time.perf_counter()
+            super(_JiraRetry, self).sleep(response)
+            self.tracer.add(
+                "retry backoff",
+                "retry",
+                start,
+                time.perf_counter(),
+                {"status": response.status if response else None},
+            )
+
+    return _JiraRetry
+
+
+@functools.lru_cache(maxsize=None)
+def _circuit_open_error():
+    class JiraCircuitOpenError(requests.ConnectionError):
+        """
+        Raised instead of sending a request while the circuit breaker is
+        open.
+        """
+
+    JiraCircuitOpenError.__module__ = __name__
+    return JiraCircuitOpenError
+
+
+def __getattr__(name):
+    # Exceptions deriving from lazily imported modules
+    if name == "JiraCircuitOpenError":
+        return _circuit_open_error()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+class JiraCircuitBreaker(object):
+    """
+    Stop sending requests to an unavailable Jira.  The breaker opens after
+    `failures` consecutive failed requests, or when at least `error_rate`
+    of the last BREAKER_WINDOW requests failed.  While open, requests fail
+    immediately.  After `reset_timeout` seconds a single probe request is
+    let through, the breaker closes again when it succeeds.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failures, error_rate, reset_timeout):
+        self.failures = failures
+        self.error_rate = error_rate
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.opened = None
+        self._consecutive = 0
+        self._window = collections.deque(maxlen=BREAKER_WINDOW)
+        self._lock = threading.Lock()
+
+    def check(self):
+        """
+        Raise :class:`JiraCircuitOpenError` unless a request may be sent.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            remaining = self.opened + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining <= 0:
+                # Let this request through as a probe
+                self.state = self.HALF_OPEN
+                return
+            raise _circuit_open_error()(
+                "Jira circuit breaker is open after repeated failures, "
+                "next request in %.1fs" % max(remaining, 0)
+            )
+
+    def record(self, success):
+        with self._lock:
+            self._window.append(success)
+            if success:
+                self._consecutive = 0
+                if self.state == self.HALF_OPEN:
+                    self.state = self.CLOSED
+                    self._window.clear()
+                return
+            self._consecutive += 1
+            if (
+                self.state == self.HALF_OPEN
+                or self._consecutive >= self.failures
+                or (
+                    len(self._window) == self._window.maxlen
+                    and self._window.count(False)
+                    >= self.error_rate * len(self._window)
+                )
+            ):
+                self.state = self.OPEN
+                self.opened = time.monotonic()
+
+
+class JiraRateLimiter(object):
+    """
+    Scheduler shared by all requests to Jira.  At most `limit` requests are
+    in flight, the limit is halved on every 429 and grows by one after
+    `limit` successful requests (AIMD), between 1 and `max_concurrency`.
+    When Jira asks to slow down by ``Retry-After`` or an exhausted
+    ``X-RateLimit-Remaining``, all requests are held back until the given
+    time.
+    """
+
+    def __init__(self, max_concurrency, stats=None):
+        self.max_concurrency = max(max_concurrency, 1)
+        self.limit = self.max_concurrency
+        self.in_flight = 0
+        self._successes = 0
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.stats = stats
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        with self._cond:
+            wait = self._try_acquire()
+            while wait != 0:
+                self._cond.wait(wait)
+                wait = self._try_acquire()
+
+    async def acquire_async(self):
+        """Wait on the event loop until a request may be sent."""
+        while True:
+            with self._cond:
+                wait = self._try_acquire()
+            if wait == 0:
+                return
+            await asyncio.sleep(
+                RATE_LIMIT_POLL_INTERVAL if wait is None else wait
+            )
+
+    def release(self, status=None, headers=None):
+        """
+        Finish a request, `status` and `headers` of its response adapt the
+        limit.  Requests without a response do not change it.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            self._update(status, headers)
+            self._cond.notify_all()
+
+    def notify(self, status, headers):
+        """Adapt to a response which is retried by urllib3."""
+        with self._cond:
+            self._update(status, headers)
+            self._cond.notify_all()
+
+    def _try_acquire(self):
+        """
+        Take a slot and return 0, otherwise return the seconds until the
+        pause ends or None when all slots are taken.
+        """
+        paused = self.paused_until - time.monotonic()
+        if paused > 0:
+            return paused
+        if self.in_flight >= self.limit:
+            return None
+        self.in_flight += 1
+        return 0
+
+    def _update(self, status, headers):
+        headers = headers or {}
+        pause = 0.0
+        if status == 429:
+            self.limit = max(self.limit // 2, 1)
+            self._successes = 0
+            self.throttled += 1
+            if self.stats:
+                self.stats.record_throttle(self.limit)
+            pause = _retry_after(headers.get("Retry-After"))
+            if pause is None:
+                pause = DEFAULT_THROTTLE_PAUSE
+        elif status is not None and status < 400:
+            self._successes += 1
+            if self._successes >= self.limit:
+                self.limit = min(self.limit + 1, self.max_concurrency)
+                self._successes = 0
+        if headers.get("X-RateLimit-Remaining", "").strip() == "0":
+            reset = _retry_after(headers.get("X-RateLimit-Reset"))
+            pause = max(
+                pause, DEFAULT_THROTTLE_PAUSE if reset is None else reset
+            )
+        if pause:
+            pause *= 1 + random.random() * RATE_LIMIT_JITTER
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+
 class JiraSiteConnection(object):
     def __init__(
         self,
@@ -201,12 +1247,25 @@ class JiraSiteConnection(object):
         password=None,
         verify=True,
         token=None,
+        timeout=None,
+        stats=None,
+        tracer=None,
+        breaker=None,
+        limiter=None,
     ):
         self.url = url
         self.username = username
         self.password = password
         self.verify = verify
         self.token = token
+        self.timeout = timeout
+        self.retry_total = 0
+        self.retry_backoff_factor = 0
+        self.stats = stats
+        self.tracer = tracer
+        self.breaker = breaker
+        self.limiter = limiter
+        self._retry_logger = _RetryLogger(self)
 
         self.is_connected = False
 
@@ -230,8 +1289,17 @@ class JiraSiteConnection(object):
             )
         self.session = requests.Session()
 
-    def setup_retries(self, total, backoff_factor):
-        retries = urllib3.Retry(
+    def setup_retries(
+        self,
+        total,
+        backoff_factor,
+        pool_maxsize=None,
+    ):
+        self.retry_total = total
+        self.retry_backoff_factor = backoff_factor
+        retries = (
+            _jira_retry() if self.tracer or self.limiter else urllib3.Retry
+        )(
             total=total,
             backoff_factor=backoff_factor,
             respect_retry_after_header=True,  # use retry-after header
@@ -240,71 +1308,742 @@ class JiraSiteConnection(object):
                 "GET",
             },
         )
+        retries.tracer = self.tracer
+        retries.limiter = self.limiter
         self.session.mount(
-            self.url, requests.adapters.HTTPAdapter(max_retries=retries)
+            self.url,
+            requests.adapters.HTTPAdapter(
+                max_retries=retries,
+                pool_maxsize=pool_maxsize or requests.adapters.DEFAULT_POOLSIZE,
+            ),
         )
 
-    def _jira_request(self, url, method="get", **kwargs):
+    def _jira_request(self, url, method="get", label=None, **kwargs):
         if "verify" not in kwargs:
             kwargs["verify"] = self.verify
+        if "timeout" not in kwargs:
+            kwargs["timeout"] = self.timeout
+
+        if self.breaker:
+            self.breaker.check()
+        if self.limiter:
+            self.limiter.acquire()
+        start = time.perf_counter()
+        rsp = None
+        try:
+            if self.basic_auth:
+                rsp = self.session.request(
+                    method, url, auth=self.basic_auth, **kwargs
+                )
 
-        if self.basic_auth:
-            rsp = self.session.request(
-                method, url, auth=self.basic_auth, **kwargs
-            )
-
-        elif self.headers:
-            rsp = self.session.request(
-                method, url, headers=self.headers, **kwargs
-            )
+            elif self.headers:
+                rsp = self.session.request(
+                    method, url, headers=self.headers, **kwargs
+                )
 
-        else:
-            rsp = self.session.request(method, url, **kwargs)
+            else:
+                rsp = self.session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            if self.breaker:
+                self.breaker.record(False)
+            if self.stats or self.tracer:
+                self._record_request(label or url, start, error=e)
+            raise
+        finally:
+            if self.limiter:
+                if rsp is None:
+                    self.limiter.release()
+                else:
+                    self.limiter.release(rsp.status_code, rsp.headers)
+        if self.breaker:
+            # Client errors like 404 mean Jira is up
+            self.breaker.record(rsp.status_code < 500)
+        if self.stats or self.tracer:
+            self._record_request(label or url, start, rsp)
         rsp.raise_for_status()
         return rsp
 
+    def _record_request(self, label, start, rsp=None, error=None):
+        end = time.perf_counter()
+        status = rsp.status_code if rsp is not None else None
+        if self.stats:
+            retries = getattr(getattr(rsp, "raw", None), "retries", None)
+            self.stats.record_request(
+                label,
+                end - start,
+                status,
+                len(rsp.content) if rsp is not None else 0,
+                len(retries.history) if retries else 0,
+            )
+        if self.tracer:
+            self.tracer.add(
+                "GET %s" % label,
+                "http",
+                start,
+                end,
+                {"status": status, "error": str(error) if error else None},
+            )
+
     def check_connection(self):
         """Validate authentication and reachability. Does not verify browse
         permissions."""
         auth_url = "{url}/rest/api/2/myself".format(url=self.url)
-        self._jira_request(auth_url)
+        self._jira_request(auth_url, label="myself")
         self.is_connected = True
         return True
 
-    @retry(JSONDecodeError, tries=3, delay=2)
+    @_retry_json_errors
     def get_issue(self, issue_id, return_jira_metadata):
         if not self.is_connected:
             self.check_connection()
         issue_url = "{url}/rest/api/2/issue/{issue_id}".format(
             url=self.url, issue_id=issue_id
         )
-        issue = self._jira_request(issue_url).json()
-        field = issue["fields"]
+        rsp = self._jira_request(
+            issue_url,
+            label=issue_id,
+            params={"fields": _fields_param(return_jira_metadata)},
+        )
+        issue = _json_loads(rsp.content)
+        return self._parse_fields(issue["fields"], return_jira_metadata)
+
+    @_retry_json_errors
+    def get_issues(self, issue_ids, return_jira_metadata, updated_since=None):
+        """
+        Fetch several issues with a single JQL search.  Returns a dict of
+        parsed issues by issue ID, issues which were not found are omitted.
+        With `updated_since` (a timestamp) only issues updated since then
+        are returned.
+        """
+        if not self.is_connected:
+            self.check_connection()
+        search_url = "{url}/rest/api/2/search".format(url=self.url)
+        jql = _issue_keys_jql(issue_ids)
+        if updated_since is not None:
+            # Relative dates do not depend on the time zone of the Jira user,
+            # round up and add a minute for the precision of the search
+            minutes = int((time.time() - updated_since) // 60) + 2
+            jql += ' AND updated >= "-%dm"' % minutes
+        params = {
+            "jql": jql,
+            "maxResults": len(issue_ids),
+            # Do not fail the whole search on unknown or hidden keys
+            "validateQuery": "warn",
+            "fields": _fields_param(return_jira_metadata),
+        }
+        rsp = self._jira_request(
+            search_url,
+            label="search (%d issues)" % len(issue_ids),
+            params=params,
+        )
+        result = _json_loads(rsp.content)
+        return dict(
+            (
+                issue["key"],
+                self._parse_fields(issue["fields"], return_jira_metadata),
+            )
+            for issue in result.get("issues", [])
+        )
+
+    @_retry_json_errors
+    def get_existing_keys(self, issue_ids):
+        """
+        Returns the set of the issue IDs which still exist and are visible,
+        using a single JQL search which does not transfer any fields.
+        Issues moved to another key are returned by their new key.
+        """
+        if not self.is_connected:
+            self.check_connection()
+        search_url = "{url}/rest/api/2/search".format(url=self.url)
+        params = {
+            "jql": _issue_keys_jql(issue_ids),
+            "maxResults": len(issue_ids),
+            "validateQuery": "warn",
+            "fields": "key",
+        }
+        rsp = self._jira_request(
+            search_url,
+            label="search keys (%d issues)" % len(issue_ids),
+            params=params,
+        )
+        result = _json_loads(rsp.content)
+        return set(issue["key"] for issue in result.get("issues", []))
+
+    @staticmethod
+    def _parse_fields(field, return_jira_metadata):
         return (
             field
             if return_jira_metadata
-            else {
-                "components": set(
-                    c["name"] for c in field.get("components", set())
-                ),
-                "versions": set(
-                    v["name"] for v in field.get("versions", set())
-                ),
-                "fixed_versions": set(
-                    v["name"] for v in field.get("fixVersions", set())
-                ),
-                "status": field["status"]["name"].lower(),
-                "resolution": (
+            else JiraIssueRecord(
+                (c["name"] for c in field.get("components", ())),
+                (v["name"] for v in field.get("versions", ())),
+                (v["name"] for v in field.get("fixVersions", ())),
+                field["status"]["name"].lower(),
+                (
                     field["resolution"]["name"].lower()
                     if field["resolution"]
                     else None
                 ),
-            }
+            )
         )
 
     def get_url(self):
         return self.url
 
+    def get_identity(self):
+        """
+        Returns who is asking Jira, the username or a hash of the token, so
+        cached lookups are not shared between users.
+        """
+        if self.basic_auth:
+            return "user:%s" % self.username
+        if self.token:
+            return "token:%s" % hashlib.sha256(self.token.encode()).hexdigest()
+        return ""
+
+
+class JiraAsyncFetcher(object):
+    """
+    Resolve many issues on a single asyncio event loop using the url,
+    credentials and SSL settings of a `JiraSiteConnection`.  At most
+    `concurrency` requests are in flight at once.  Requires aiohttp.
+    """
+
+    def __init__(self, connection, concurrency=DEFAULT_ASYNC_CONCURRENCY):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ValueError(
+                "Configuration error: asynchronous fetching requires aiohttp "
+                "to be installed."
+            )
+        self.aiohttp = aiohttp
+        self.conn = connection
+        self.concurrency = max(concurrency, 1)
+
+    def fetch(self, issue_ids, return_jira_metadata):
+        """
+        Fetch the issues and block until all lookups are finished.  Returns
+        a dict with either the parsed issue or the
+        :class:`requests.RequestException` raised for every issue ID.
+        """
+        return asyncio.run(self._fetch_all(issue_ids, return_jira_metadata))
+
+    async def _fetch_all(self, issue_ids, return_jira_metadata):
+        aiohttp = self.aiohttp
+        semaphore = asyncio.Semaphore(self.concurrency)
+        auth = None
+        if self.conn.basic_auth:
+            auth = aiohttp.BasicAuth(*self.conn.basic_auth)
+        # Use the proxies and .netrc of the environment, like requests does
+        async with aiohttp.ClientSession(
+            auth=auth,
+            headers=self.conn.headers,
+            trust_env=True,
+            connector=aiohttp.TCPConnector(
+                limit=self.concurrency, ssl=self._ssl_context()
+            ),
+            timeout=aiohttp.ClientTimeout(total=self.conn.timeout),
+        ) as session:
+
+            async def fetch_one(issue_id):
+                async with semaphore:
+                    try:
+                        issue = await self._get_issue(
+                            session, issue_id, return_jira_metadata
+                        )
+                    except requests.RequestException as e:
+                        return issue_id, e
+                return issue_id, self.conn._parse_fields(
+                    issue["fields"], return_jira_metadata
+                )
+
+            results = await asyncio.gather(
+                *[fetch_one(issue_id) for issue_id in issue_ids]
+            )
+        return dict(results)
+
+    async def _get_issue(self, session, issue_id, return_jira_metadata):
+        issue_url = "{url}/rest/api/2/issue/{issue_id}".format(
+            url=self.conn.url, issue_id=issue_id
+        )
+        params = {"fields": _fields_param(return_jira_metadata)}
+        stats, tracer = self.conn.stats, self.conn.tracer
+        breaker, limiter = self.conn.breaker, self.conn.limiter
+        attempt = 0
+        while True:
+            attempt += 1
+            retry_after = None
+            status, headers, body = None, None, b""
+            if breaker:
+                breaker.check()
+            if limiter:
+                await limiter.acquire_async()
+            start = time.perf_counter()
+            try:
+                async with session.get(issue_url, params=params) as rsp:
+                    status, headers = rsp.status, rsp.headers
+                    body = await rsp.read()
+                    if rsp.status < 400:
+                        return _json_loads(body)
+                    error = _http_error(rsp.status, rsp.reason, issue_url)
+                    if rsp.status not in urllib3.Retry.RETRY_AFTER_STATUS_CODES:
+                        raise error
+                    retry_after = rsp.headers.get("Retry-After")
+            except JSONDecodeError as e:
+                error = requests.RequestException(e)
+            except asyncio.TimeoutError as e:
+                error = requests.Timeout(e)
+            except self.aiohttp.ClientError as e:
+                error = requests.ConnectionError(e)
+            finally:
+                end = time.perf_counter()
+                if limiter:
+                    limiter.release(status, headers)
+                if breaker:
+                    breaker.record(status is not None and status < 500)
+                if stats:
+                    stats.record_request(
+                        issue_id, end - start, status, len(body)
+                    )
+                if tracer:
+                    tracer.add(
+                        "GET %s" % issue_id,
+                        "http",
+                        start,
+                        end,
+                        {"status": status},
+                        tracer.next_id(),
+                    )
+            if attempt > self.conn.retry_total:
+                raise error
+            if stats:
+                stats.record_retry()
+            delay = self._backoff(attempt, retry_after)
+            start = time.perf_counter()
+            await asyncio.sleep(delay)
+            if tracer:
+                tracer.add(
+                    "retry backoff",
+                    "retry",
+                    start,
+                    time.perf_counter(),
+                    {"status": status},
+                    tracer.next_id(),
+                )
+
+    def _backoff(self, attempt, retry_after):
+        if retry_after and retry_after.isdigit():
+            return int(retry_after)
+        return self.conn.retry_backoff_factor * (2 ** (attempt - 1))
+
+    def _ssl_context(self):
+        """
+        Verify certificates against the CA bundle requests would use, the
+        configured one, ``REQUESTS_CA_BUNDLE``, ``CURL_CA_BUNDLE`` or the
+        bundle of certifi, instead of the system CA store.
+        """
+        if self.conn.verify is False:
+            return False
+        if isinstance(self.conn.verify, str):
+            bundle = self.conn.verify
+        else:
+            bundle = (
+                os.environ.get("REQUESTS_CA_BUNDLE")
+                or os.environ.get("CURL_CA_BUNDLE")
+                or requests.utils.DEFAULT_CA_BUNDLE_PATH
+            )
+        if os.path.isdir(bundle):
+            return ssl.create_default_context(capath=bundle)
+        return ssl.create_default_context(cafile=bundle)
+
+
+class JiraIssueCache(object):
+    """
+    Persistent cache of parsed issues stored in a SQLite database, so
+    subsequent pytest sessions do not need to fetch them again.  Entries
+    fetched more than `ttl` seconds ago are considered expired, those
+    fetched less than `hard_ttl` seconds ago may still be served stale.
+    Issue IDs which were not found or not accessible are remembered for
+    `negative_ttl` seconds.  Entries are kept by the `identity` of the Jira
+    user, as the issues visible depend on it.
+    """
+
+    def __init__(self, path, ttl, negative_ttl=0, hard_ttl=0, identity=""):
+        if hard_ttl and hard_ttl <= ttl:
+            raise ValueError(
+                "Configuration error: the hard TTL of the persistent cache "
+                "must be longer than its TTL."
+            )
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hard_ttl = hard_ttl
+        self.identity = identity
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.db:
+            # xdist workers may open the cache at once
+            self.db.execute("BEGIN IMMEDIATE")
+            version = self.db.execute("PRAGMA user_version").fetchone()[0]
+            if version != CACHE_SCHEMA_VERSION:
+                self.db.execute("DROP TABLE IF EXISTS issues")
+                self.db.execute("DROP TABLE IF EXISTS missing")
+                self.db.execute(
+                    "PRAGMA user_version = %d" % CACHE_SCHEMA_VERSION
+                )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS issues ("
+                "url TEXT, identity TEXT, issue_id TEXT, metadata INTEGER, "
+                "issue TEXT, fetched REAL, "
+                "PRIMARY KEY (url, identity, issue_id, metadata))"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS missing ("
+                "url TEXT, identity TEXT, issue_id TEXT, status INTEGER, "
+                "fetched REAL, PRIMARY KEY (url, identity, issue_id))"
+            )
+
+    def get_many(self, url, issue_ids, return_jira_metadata):
+        """
+        Returns a dict of not expired issues by issue ID.
+        """
+        return dict(
+            (issue_id, issue)
+            for issue_id, (issue, _) in self._select(
+                url,
+                issue_ids,
+                return_jira_metadata,
+                "fetched >= ?",
+                time.time() - self.ttl,
+            ).items()
+        )
+
+    def get_expired(self, url, issue_ids, return_jira_metadata):
+        """
+        Returns a dict of expired issues by issue ID, as tuples of the issue
+        and the time it was fetched.
+        """
+        return self._select(
+            url,
+            issue_ids,
+            return_jira_metadata,
+            "fetched < ?",
+            time.time() - self.ttl,
+        )
+
+    def get_stale(self, url, issue_ids, return_jira_metadata):
+        """
+        Returns a dict of expired issues fetched less than `hard_ttl` seconds
+        ago by issue ID, as tuples of the issue and the time it was fetched.
+        """
+        now = time.time()
+        return self._select(
+            url,
+            issue_ids,
+            return_jira_metadata,
+            "fetched < ? AND fetched >= ?",
+            now - self.ttl,
+            now - self.hard_ttl,
+        )
+
+    def _select(self, url, issue_ids, return_jira_metadata, condition, *args):
+        issue_ids = list(issue_ids)
+        issues = {}
+        with self._lock:
+            # Stay within the limit of SQLite host parameters
+            for start in range(0, len(issue_ids), 500):
+                chunk = issue_ids[start : start + 500]
+                rows = self.db.execute(
+                    "SELECT issue_id, issue, fetched FROM issues WHERE "
+                    "url = ? AND identity = ? AND metadata = ? AND %s AND "
+                    "issue_id IN (%s)"
+                    % (condition, ",".join("?" * len(chunk))),
+                    [url, self.identity, bool(return_jira_metadata)]
+                    + list(args)
+                    + chunk,
+                )
+                for issue_id, issue, fetched in rows:
+                    issues[issue_id] = (
+                        _load_issue(issue, return_jira_metadata),
+                        fetched,
+                    )
+        return issues
+
+    def set_many(self, url, issues, return_jira_metadata, fetched=None):
+        fetched = fetched or time.time()
+        with self._lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        url,
+                        self.identity,
+                        issue_id,
+                        bool(return_jira_metadata),
+                        _dump(issue),
+                        fetched,
+                    )
+                    for issue_id, issue in issues.items()
+                ],
+            )
+
+    def delete_many(self, url, issue_ids):
+        with self._lock, self.db:
+            self.db.executemany(
+                "DELETE FROM issues WHERE url = ? AND identity = ? AND "
+                "issue_id = ?",
+                [(url, self.identity, issue_id) for issue_id in issue_ids],
+            )
+
+    def get_missing(self, url, issue_ids):
+        """
+        Returns a dict of the HTTP status by issue ID for the not expired
+        issue IDs which were not found or not accessible.
+        """
+        issue_ids = list(issue_ids)
+        missing = {}
+        with self._lock:
+            for start in range(0, len(issue_ids), 500):
+                chunk = issue_ids[start : start + 500]
+                rows = self.db.execute(
+                    "SELECT issue_id, status FROM missing WHERE url = ? AND "
+                    "identity = ? AND fetched >= ? AND issue_id IN (%s)"
+                    % ",".join("?" * len(chunk)),
+                    [url, self.identity, time.time() - self.negative_ttl]
+                    + chunk,
+                )
+                missing.update(rows)
+        return missing
+
+    def set_missing(self, url, statuses):
+        fetched = time.time()
+        with self._lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO missing VALUES (?, ?, ?, ?, ?)",
+                [
+                    (url, self.identity, issue_id, status, fetched)
+                    for issue_id, status in statuses.items()
+                ],
+            )
+
+    def clear(self):
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM issues")
+            self.db.execute("DELETE FROM missing")
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+class JiraStats(object):
+    """
+    Counters and request latencies of the Jira lookups of a session, shared
+    by the hooks, the connection and the fetcher threads.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.not_found = 0
+        self.bytes_received = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # 429 responses and the concurrency limit after the last one
+        self.throttled = 0
+        self.concurrency_limit = None
+        # (seconds, issue ID or request description) of every request
+        self.latencies = []
+        # Seconds spent resolving issues during collection
+        self.phase_time = 0.0
+        self._lock = threading.Lock()
+
+    def record_request(self, label, latency, status=None, size=0, retries=0):
+        """
+        Record a request which took `latency` seconds.  Requests without a
+        `status` failed without a response.
+        """
+        with self._lock:
+            self.requests += 1
+            self.retries += retries
+            self.bytes_received += size
+            self.latencies.append((latency, label))
+            if status == 404:
+                self.not_found += 1
+            elif status is None or status >= 400:
+                self.errors += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_throttle(self, limit):
+        with self._lock:
+            self.throttled += 1
+            self.concurrency_limit = limit
+
+    def record_lookup(self, hit):
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+    def export(self):
+        """Return the statistics as a dict passed from xdist workers."""
+        with self._lock:
+            return dict(
+                (name, value)
+                for name, value in vars(self).items()
+                if not name.startswith("_")
+            )
+
+    def merge(self, exported):
+        """Add the statistics exported by an xdist worker."""
+        with self._lock:
+            for name in STATS_COUNTERS:
+                setattr(self, name, getattr(self, name) + exported[name])
+            self.latencies.extend(
+                (latency, label) for latency, label in exported["latencies"]
+            )
+            # Workers resolve issues at the same time
+            self.phase_time = max(self.phase_time, exported["phase_time"])
+            if exported["concurrency_limit"] is not None:
+                self.concurrency_limit = min(
+                    self.concurrency_limit or exported["concurrency_limit"],
+                    exported["concurrency_limit"],
+                )
+
+    def percentile(self, percent):
+        """Nearest-rank percentile of the request latencies."""
+        latencies = sorted(latency for latency, _ in self.latencies)
+        if not latencies:
+            return 0.0
+        rank = int(math.ceil(percent / 100.0 * len(latencies)))
+        return latencies[max(rank, 1) - 1]
+
+    def slowest(self, count=STATS_SLOWEST):
+        return sorted(self.latencies, reverse=True)[:count]
+
+    def summary(self):
+        """Return the lines of the terminal summary."""
+        lines = [
+            "requests: %d, retries: %d, errors: %d, not found: %d, "
+            "received: %.1f kB"
+            % (
+                self.requests,
+                self.retries,
+                self.errors,
+                self.not_found,
+                self.bytes_received / 1024.0,
+            ),
+            "lookups: %d cache hits, %d cache misses"
+            % (self.cache_hits, self.cache_misses),
+            "collection phase: %.3fs, waiting for responses: %.3fs"
+            % (self.phase_time, sum(latency for latency, _ in self.latencies)),
+        ]
+        if self.throttled:
+            lines.append(
+                "throttled: %d times, concurrency limit: %d"
+                % (self.throttled, self.concurrency_limit)
+            )
+        if self.latencies:
+            lines.append(
+                "latency: p50 %.3fs, p95 %.3fs, p99 %.3fs, max %.3fs"
+                % (
+                    self.percentile(50),
+                    self.percentile(95),
+                    self.percentile(99),
+                    self.percentile(100),
+                )
+            )
+            lines.append("slowest requests:")
+            lines.extend(
+                "  %.3fs %s" % (latency, label)
+                for latency, label in self.slowest()
+            )
+        return lines
+
+
+class JiraTracer(object):
+    """
+    Collect spans of the Jira lookups and write them as Chrome trace-event
+    JSON, which can be loaded in Perfetto or chrome://tracing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pid = os.getpid()
+        self.events = []
+        self._thread_names = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, name, cat, start, end, args=None, async_id=None):
+        """
+        Add a span from `start` to `end` (time.perf_counter() values).
+        Spans with an `async_id` may overlap other spans of the same thread,
+        e.g. requests made on an asyncio event loop.
+        """
+        event = {
+            "name": name,
+            "cat": cat,
+            "ts": start * 1e6,
+            "pid": self.pid,
+            "tid": threading.get_ident(),
+            "args": args or {},
+        }
+        with self._lock:
+            self._thread_names.setdefault(
+                event["tid"], threading.current_thread().name
+            )
+            if async_id is None:
+                event.update(ph="X", dur=(end - start) * 1e6)
+                self.events.append(event)
+            else:
+                event.update(ph="b", id=async_id)
+                self.events.append(event)
+                self.events.append(dict(event, ph="e", ts=end * 1e6, args={}))
+
+    @contextlib.contextmanager
+    def span(self, name, cat, **args):
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.add(name, cat, start, time.perf_counter(), args)
+
+    def next_id(self):
+        return next(self._ids)
+
+    def write(self):
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": self.pid,
+                "args": {"name": "pytest-jira"},
+            }
+        ] + [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self.pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in self._thread_names.items()
+        ]
+        with open(self.path, "w") as f:
+            json.dump(
+                {
+                    "traceEvents": metadata + self.events,
+                    "displayTimeUnit": "ms",
+                },
+                f,
+            )
+
 
 class JiraMarkerReporter(object):
     issue_re = r"([A-Z]+-[0-9]+)"
@@ -313,10 +2052,15 @@ class JiraMarkerReporter(object):
         self.issue_pattern = re.compile(pattern or self.issue_re)
         self.docs = docs
         self.strategy = strategy.lower()
+        self._has_iter_markers = _has_closest_marker()
+        # Parsed issues by test function and marks
+        self._jira_issues = dict()
+        # Issue IDs which match the issue pattern
+        self._valid_ids = set()
 
     def _get_marks(self, item):
         marks = []
-        if Version(pytest.__version__) >= Version("3.6.0"):
+        if self._has_iter_markers:
             for mark in item.iter_markers("jira"):
                 marks.append(mark)
         else:
@@ -330,8 +2074,26 @@ class JiraMarkerReporter(object):
         return marks
 
     def get_jira_issues(self, item):
+        """
+        Returns the unique (issue ID, skipif) pairs referenced by the item.
+        Results are shared by all items of the same test function with the
+        same marks, e.g. parametrized tests, and must not be modified.
+        """
+        marks = self._get_marks(item)
+        key = (
+            getattr(item, "function", None),
+            tuple(id(mark) for mark in marks),
+        )
+        cached = self._jira_issues.get(key)
+        if cached is None:
+            # Keep the marks alive, so their ids are not reused
+            cached = marks, self._parse_jira_issues(item, marks)
+            self._jira_issues[key] = cached
+        return cached[1]
+
+    def _parse_jira_issues(self, item, marks):
         jira_ids = []
-        for mark in self._get_marks(item):
+        for mark in marks:
             skip_if = mark.kwargs.get("skipif", True)
 
             if len(mark.args) == 0:
@@ -350,12 +2112,16 @@ class JiraMarkerReporter(object):
             )
 
         # Filter valid issues, and return unique issues
-        for jid, _ in set(jira_ids):
+        jira_ids = set(jira_ids)
+        for jid, _ in jira_ids:
+            if jid in self._valid_ids:
+                continue
             if not self.issue_pattern.match(jid):
                 raise ValueError(
                     "JIRA marker argument `%s` does not match pattern" % jid
                 )
-        return list(set(jira_ids))
+            self._valid_ids.add(jid)
+        return list(jira_ids)
 
     def get_default(self, jid):
         if self.strategy == "open":
@@ -367,6 +2133,286 @@ class JiraMarkerReporter(object):
         return None
 
 
+def _fields_param(return_jira_metadata):
+    """
+    Request only the fields which are used, all fields of the issue schema
+    with `return_jira_metadata`.
+    """
+    if return_jira_metadata:
+        return ",".join(issue_model.JiraIssueSchema._declared_fields)
+    return ",".join(ISSUE_FIELDS)
+
+
+def _json_default(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, JiraIssueRecord):
+        return dict(value)
+    raise TypeError("%r is not JSON serializable" % value)
+
+
+def _dump(issue):
+    return json.dumps(issue, default=_json_default)
+
+
+def _load_issue(data, return_jira_metadata):
+    return _restore_issue(json.loads(data), return_jira_metadata)
+
+
+def _restore_issue(issue, return_jira_metadata):
+    if isinstance(issue, dict) and not return_jira_metadata:
+        if len(issue) == len(ISSUE_RECORD_FIELDS) and all(
+            name in issue for name in ISSUE_RECORD_FIELDS
+        ):
+            return JiraIssueRecord(**issue)
+        for name in ISSUE_SET_FIELDS:
+            if name in issue:
+                issue[name] = set(issue[name])
+    return issue
+
+
+def _read_snapshot(path):
+    """
+    Returns the header of a snapshot and an iterator of its issues, the
+    issues are read lazily line by line.
+    """
+    f = gzip.open(path, "rt")
+    header = json.loads(f.readline())
+    if header.get("schema_version") != SNAPSHOT_SCHEMA_VERSION:
+        f.close()
+        raise ValueError(
+            "Configuration error: unsupported snapshot schema version %s."
+            % header.get("schema_version")
+        )
+
+    def issues():
+        with f:
+            for line in f:
+                record = json.loads(line)
+                yield record["issue_id"], record["issue"]
+
+    return header, issues()
+
+
+def _cache_path(config):
+    if hasattr(config, "cache"):
+        return str(config.cache.mkdir("jira").joinpath("issues.sqlite"))
+    path = os.path.join(str(config.rootdir), ".pytest_cache", "jira")
+    os.makedirs(path, exist_ok=True)
+    return os.path.join(path, "issues.sqlite")
+
+
+def _http_error(status_code, reason, url):
+    response = requests.Response()
+    response.status_code = status_code
+    response.reason = reason
+    response.url = url
+    return requests.HTTPError(
+        "%s Error: %s for url: %s" % (status_code, reason, url),
+        response=response,
+    )
+
+
+def _retry_after(value):
+    """
+    Seconds until the time given by a ``Retry-After`` or
+    ``X-RateLimit-Reset`` header: seconds, a Unix timestamp, an HTTP date or
+    an ISO 8601 timestamp as sent by Jira Cloud.  None if the header is
+    missing or not understood.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        # Unix timestamp rather than a delay
+        if seconds > 1e9:
+            seconds -= time.time()
+        return max(seconds, 0.0)
+    try:
+        when = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def _shared_error(status, message):
+    """
+    Rebuild the error of a lookup which failed in another xdist worker.
+    """
+    if status is None:
+        return requests.ConnectionError(message)
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(message, response=response)
+
+
+def _lock_owner_alive(path):
+    """
+    Return False if the process which created the lock file is gone.
+    """
+    try:
+        with open(path) as f:
+            pid = int(f.read())
+    except (OSError, ValueError):
+        # Not written yet
+        return True
+    if os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _is_not_found(exc):
+    return (
+        hasattr(exc.response, "status_code") and exc.response.status_code == 404
+    )
+
+
+def _span(tracer, name, cat, **args):
+    if tracer:
+        return tracer.span(name, cat, **args)
+    return contextlib.nullcontext(args)
+
+
+def _trace_path(config, path):
+    """Give every xdist worker its own trace file."""
+    workerinput = getattr(config, "workerinput", None)
+    if workerinput is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return "%s-%s%s" % (root, workerinput["workerid"], ext)
+
+
+@functools.lru_cache(maxsize=None)
+def _issue_schema():
+    """Schemas are expensive to create, a single instance is reused."""
+    return issue_model.JiraIssueSchema()
+
+
+def _intern(name):
+    return sys.intern(name) if name is not None else None
+
+
+def _has_closest_marker():
+    """Node.get_closest_marker and Node.iter_markers were added in 3.6.0"""
+    from packaging.version import Version
+
+    return Version(pytest.__version__) >= Version("3.6.0")
+
+
+def _issue_keys_jql(issue_ids):
+    return "key in (%s)" % ",".join('"%s"' % i for i in issue_ids)
+
+
+def _chunks(issue_ids):
+    """
+    Split issue IDs into chunks fitting into a single search request.
+    """
+    chunk, length = [], len(_issue_keys_jql([]))
+    for issue_id in issue_ids:
+        # quoted key and the separating comma
+        key_length = len(issue_id) + 3
+        if chunk and (
+            len(chunk) >= SEARCH_MAX_RESULTS
+            or length + key_length > SEARCH_MAX_JQL_LENGTH
+        ):
+            yield chunk
+            chunk, length = [], len(_issue_keys_jql([]))
+        chunk.append(issue_id)
+        length += key_length
+    if chunk:
+        yield chunk
+
+
+# Parsed jira.cfg defaults by the stat signature of the configuration files
+_config_cache = {}
+
+
+def _read_config(rootdir):
+    """
+    Return the parsed jira.cfg files.  The result is cached as long as the
+    files do not change.  xdist workers use the result of the controller
+    and do not read the files again.
+    """
+    inherited = None
+    if os.getenv("PYTEST_XDIST_WORKER"):
+        # Read once, not seen by the tests and their subprocesses
+        inherited = os.environ.pop(CONFIG_CACHE_ENV_VAR, None)
+    if inherited:
+        inherited = json.loads(inherited)
+        # Set by the controller, not by an earlier session of this process
+        if (
+            inherited["key"] == _config_key(rootdir)
+            and inherited["pid"] != os.getpid()
+        ):
+            return configparser.ConfigParser(inherited["defaults"])
+    paths = [
+        os.path.join("/", "etc", "jira.cfg"),
+        os.path.join(str(rootdir), "jira.cfg"),
+        os.path.expanduser(os.path.join("~", "jira.cfg")),
+        "jira.cfg",
+    ]
+    signature = _stat_signature(paths)
+    defaults = _config_cache.get(signature)
+    if defaults is None:
+        config = configparser.ConfigParser()
+        config.read(paths)
+        defaults = _config_cache[signature] = dict(config.defaults())
+    return configparser.ConfigParser(defaults)
+
+
+def _config_key(rootdir):
+    return [str(rootdir), os.getcwd(), os.path.expanduser("~")]
+
+
+def _config_env(rootdir):
+    """
+    Return the value of CONFIG_CACHE_ENV_VAR for the xdist workers, the
+    parsed jira.cfg files without the credentials.
+    """
+    defaults = _read_config(rootdir).defaults()
+    return json.dumps(
+        {
+            "key": _config_key(rootdir),
+            "pid": os.getpid(),
+            "defaults": dict(
+                (name, value)
+                for name, value in defaults.items()
+                if name not in CONFIG_SECRETS
+            ),
+        }
+    )
+
+
+def _stat_signature(paths):
+    signature = []
+    for path in paths:
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            signature.append((path, None))
+        else:
+            signature.append((path, st.st_ino, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
 def _get_value(config, section, name, default=None):
     if config.has_option(section, name):
         return config.get(section, name)
@@ -397,15 +2443,7 @@ def pytest_addoption(parser):
     )
 
     # FIXME - Change to a credentials.yaml ?
-    config = six.moves.configparser.ConfigParser()
-    config.read(
-        [
-            os.path.join("/", "etc", "jira.cfg"),
-            os.path.join(str(parser.extra_info["rootdir"]), "jira.cfg"),
-            os.path.expanduser(os.path.join("~", "jira.cfg")),
-            "jira.cfg",
-        ]
-    )
+    config = _read_config(parser.extra_info["rootdir"])
 
     group.addoption(
         "--jira-url",
@@ -486,6 +2524,13 @@ def pytest_addoption(parser):
         default=_get_bool(config, "DEFAULT", "docs_search", True),
         help="Issue ID in doc strings will be ignored",
     )
+    group.addoption(
+        "--jira-disable-prefetch",
+        action="store_false",
+        dest="jira_prefetch",
+        default=_get_bool(config, "DEFAULT", "prefetch", True),
+        help="Fetch issues one by one instead of batched JQL searches",
+    )
     group.addoption(
         "--jira-issue-regex",
         action="store",
@@ -555,6 +2600,192 @@ def pytest_addoption(parser):
         ),
         help="Number of connection retries",
     )
+    group.addoption(
+        "--jira-resolve-after-deselect",
+        action="store_true",
+        dest="jira_resolve_after_deselect",
+        default=_get_bool(config, "DEFAULT", "resolve_after_deselect", False),
+        help="Resolve issues only for the items left after deselection by "
+        "-k, -m, --deselect or other plugins",
+    )
+    group.addoption(
+        "--jira-fetch-during-collection",
+        action="store_true",
+        dest="jira_fetch_during_collection",
+        default=_get_bool(config, "DEFAULT", "fetch_during_collection", False),
+        help="Fetch issues in the background while the tests are collected",
+    )
+    group.addoption(
+        "--jira-breaker-failures",
+        action="store",
+        type=int,
+        dest="jira_breaker_failures",
+        default=_get_value(
+            config, "DEFAULT", "breaker_failures", DEFAULT_BREAKER_FAILURES
+        ),
+        help="Stop sending requests to Jira after the given number of "
+        "consecutive failed requests, 0 disables the circuit breaker",
+    )
+    group.addoption(
+        "--jira-breaker-error-rate",
+        action="store",
+        type=float,
+        dest="jira_breaker_error_rate",
+        default=_get_value(
+            config, "DEFAULT", "breaker_error_rate", DEFAULT_BREAKER_ERROR_RATE
+        ),
+        help="Stop sending requests to Jira when the given fraction of the "
+        "last %d requests failed" % BREAKER_WINDOW,
+    )
+    group.addoption(
+        "--jira-breaker-reset-timeout",
+        action="store",
+        type=float,
+        dest="jira_breaker_reset_timeout",
+        default=_get_value(
+            config,
+            "DEFAULT",
+            "breaker_reset_timeout",
+            DEFAULT_BREAKER_RESET_TIMEOUT,
+        ),
+        metavar="seconds",
+        help="Seconds after which a single request is sent to check whether "
+        "Jira is available again",
+    )
+    group.addoption(
+        "--jira-disable-rate-limiter",
+        action="store_false",
+        dest="jira_rate_limiter",
+        default=_get_bool(config, "DEFAULT", "rate_limiter", True),
+        help="Do not adapt the number of concurrent requests to the rate "
+        "limits of Jira",
+    )
+    group.addoption(
+        "--jira-workers",
+        action="store",
+        type=int,
+        dest="jira_workers",
+        default=_get_value(config, "DEFAULT", "workers", 1),
+        help="Number of threads fetching issues concurrently",
+    )
+    group.addoption(
+        "--jira-async",
+        action="store_true",
+        dest="jira_async",
+        default=_get_bool(config, "DEFAULT", "async_fetch", False),
+        help="Fetch issues on an asyncio event loop (requires aiohttp)",
+    )
+    group.addoption(
+        "--jira-async-concurrency",
+        action="store",
+        type=int,
+        dest="jira_async_concurrency",
+        default=_get_value(
+            config,
+            "DEFAULT",
+            "async_concurrency",
+            DEFAULT_ASYNC_CONCURRENCY,
+        ),
+        help="Maximum number of requests in flight when fetching issues "
+        "asynchronously",
+    )
+    group.addoption(
+        "--jira-request-timeout",
+        action="store",
+        type=float,
+        dest="jira_request_timeout",
+        default=_get_value(config, "DEFAULT", "request_timeout"),
+        help="Timeout of a single request to Jira in seconds",
+    )
+    group.addoption(
+        "--jira-cache-ttl",
+        action="store",
+        type=float,
+        dest="jira_cache_ttl",
+        default=_get_value(config, "DEFAULT", "cache_ttl"),
+        metavar="seconds",
+        help="Keep fetched issues in a persistent cache for the given number "
+        "of seconds",
+    )
+    group.addoption(
+        "--jira-cache-hard-ttl",
+        action="store",
+        type=float,
+        dest="jira_cache_hard_ttl",
+        default=_get_value(config, "DEFAULT", "cache_hard_ttl"),
+        metavar="seconds",
+        help="Use expired issues of the persistent cache fetched less than "
+        "the given number of seconds ago and refresh them in the background",
+    )
+    group.addoption(
+        "--jira-negative-cache-ttl",
+        action="store",
+        type=float,
+        dest="jira_negative_cache_ttl",
+        default=_get_value(config, "DEFAULT", "negative_cache_ttl"),
+        metavar="seconds",
+        help="Remember issue IDs which were not found or not accessible in "
+        "the persistent cache for the given number of seconds",
+    )
+    group.addoption(
+        "--jira-cache-clear",
+        action="store_true",
+        dest="jira_cache_clear",
+        default=False,
+        help="Remove all issues from the persistent cache",
+    )
+    group.addoption(
+        "--jira-cache-refresh",
+        action="store_true",
+        dest="jira_cache_refresh",
+        default=_get_bool(config, "DEFAULT", "cache_refresh", False),
+        help="Revalidate expired issues of the persistent cache by searching "
+        "for issues updated since they were fetched",
+    )
+    group.addoption(
+        "--jira-snapshot-write",
+        action="store",
+        dest="jira_snapshot_write",
+        default=None,
+        metavar="path",
+        help="Write the fetched issues to a snapshot file after collection",
+    )
+    group.addoption(
+        "--jira-snapshot-read",
+        action="store",
+        dest="jira_snapshot_read",
+        default=None,
+        metavar="path",
+        help="Read issues from a snapshot file instead of fetching them from "
+        "Jira",
+    )
+    group.addoption(
+        "--jira-stats",
+        action="store_true",
+        dest="jira_stats",
+        default=_get_bool(config, "DEFAULT", "stats", False),
+        help="Report request counts and latencies of the Jira lookups in the "
+        "terminal summary",
+    )
+    group.addoption(
+        "--jira-stats-threshold",
+        action="store",
+        type=float,
+        dest="jira_stats_threshold",
+        default=_get_value(config, "DEFAULT", "stats_threshold"),
+        metavar="seconds",
+        help="Warn when resolving the Jira issues during collection takes "
+        "longer than the given number of seconds",
+    )
+    group.addoption(
+        "--jira-trace",
+        action="store",
+        dest="jira_trace",
+        default=None,
+        metavar="path",
+        help="Write a Chrome trace-event JSON file of the Jira lookups, "
+        "viewable in Perfetto",
+    )
     group.addoption(
         "--jira-return-metadata",
         action="store_true",
@@ -580,11 +2811,11 @@ def pytest_configure(config):
         "See https://github.com/rhevm-qe-automation/pytest_jira",
     )
     components = config.getvalue("jira_components")
-    if isinstance(components, six.string_types):
+    if isinstance(components, str):
         components = [c for c in components.split(",") if c]
 
     resolved_statuses = config.getvalue("jira_resolved_statuses")
-    if isinstance(resolved_statuses, six.string_types):
+    if isinstance(resolved_statuses, str):
         resolved_statuses = [
             s.strip().lower() for s in resolved_statuses.split(",") if s.strip()
         ]
@@ -592,7 +2823,7 @@ def pytest_configure(config):
         resolved_statuses = list(DEFAULT_RESOLVE_STATUSES)
 
     resolved_resolutions = config.getvalue("jira_resolved_resolutions")
-    if isinstance(resolved_resolutions, six.string_types):
+    if isinstance(resolved_resolutions, str):
         resolved_resolutions = [
             s.strip().lower()
             for s in resolved_resolutions.split(",")
@@ -601,20 +2832,89 @@ def pytest_configure(config):
     if not resolved_resolutions:
         resolved_resolutions = []
 
-    if config.getvalue("jira") and (
-        os.getenv(URL_ENV_VAR) or config.getvalue("jira_url")
-    ):
+    snapshot = None
+    if config.getvalue("jira") and config.getvalue("jira_snapshot_read"):
+        snapshot = _read_snapshot(config.getvalue("jira_snapshot_read"))
+    url = os.getenv(URL_ENV_VAR) or config.getvalue("jira_url")
+    if snapshot and not url:
+        url = snapshot[0]["url"]
+
+    if config.getvalue("jira") and url:
+        stats = JiraStats() if config.getvalue("jira_stats") else None
+        breaker = None
+        if config.getvalue("jira_breaker_failures"):
+            breaker = JiraCircuitBreaker(
+                config.getvalue("jira_breaker_failures"),
+                config.getvalue("jira_breaker_error_rate"),
+                config.getvalue("jira_breaker_reset_timeout"),
+            )
+        tracer = None
+        if config.getvalue("jira_trace"):
+            tracer = JiraTracer(
+                _trace_path(config, config.getvalue("jira_trace"))
+            )
+        workers = config.getvalue("jira_workers")
+        limiter = None
+        if config.getvalue("jira_rate_limiter"):
+            limiter = JiraRateLimiter(
+                (
+                    config.getvalue("jira_async_concurrency")
+                    if config.getvalue("jira_async")
+                    else workers
+                )
+                # A slot for the background refresh of the issues served
+                # stale, so it does not hold back the lookups
+                + (1 if config.getvalue("jira_cache_hard_ttl") else 0),
+                stats,
+            )
+        # Credentials from jira.cfg of the xdist controller
+        credentials = getattr(config, "workerinput", {}).get(
+            "jira_credentials", {}
+        )
         jira_connection = JiraSiteConnection(
-            os.getenv(URL_ENV_VAR) or config.getvalue("jira_url"),
-            os.getenv(USERNAME_ENV_VAR) or config.getvalue("jira_username"),
-            os.getenv(PASSWORD_ENV_VAR) or config.getvalue("jira_password"),
+            url,
+            os.getenv(USERNAME_ENV_VAR)
+            or config.getvalue("jira_username")
+            or credentials.get("username"),
+            os.getenv(PASSWORD_ENV_VAR)
+            or config.getvalue("jira_password")
+            or credentials.get("password"),
             config.getvalue("jira_verify"),
-            os.getenv(TOKEN_ENV_VAR) or config.getvalue("jira_token"),
+            os.getenv(TOKEN_ENV_VAR)
+            or config.getvalue("jira_token")
+            or credentials.get("token"),
+            config.getvalue("jira_request_timeout"),
+            stats,
+            tracer,
+            breaker,
+            limiter,
         )
         jira_connection.setup_retries(
             config.getvalue("jira_connection_retry_total"),
             config.getvalue("jira_connection_retry_backoff_factor"),
+            max(workers, requests.adapters.DEFAULT_POOLSIZE),
         )
+        async_fetcher = None
+        if config.getvalue("jira_async"):
+            async_fetcher = JiraAsyncFetcher(
+                jira_connection, config.getvalue("jira_async_concurrency")
+            )
+        disk_cache = None
+        cache_ttl = config.getvalue("jira_cache_ttl")
+        negative_ttl = config.getvalue("jira_negative_cache_ttl")
+        if cache_ttl or negative_ttl or config.getvalue("jira_cache_clear"):
+            disk_cache = JiraIssueCache(
+                _cache_path(config),
+                cache_ttl or 0,
+                negative_ttl or 0,
+                config.getvalue("jira_cache_hard_ttl") or 0,
+                jira_connection.get_identity(),
+            )
+            if config.getvalue("jira_cache_clear"):
+                disk_cache.clear()
+            if not (cache_ttl or negative_ttl):
+                disk_cache.close()
+                disk_cache = None
         jira_marker = JiraMarkerReporter(
             config.getvalue("jira_marker_strategy"),
             config.getvalue("jira_docs"),
@@ -632,11 +2932,52 @@ def pytest_configure(config):
             config.getini("xfail_strict"),
             config.getvalue("jira_connection_error_strategy"),
             config.getvalue("return_jira_metadata"),
+            config.getvalue("jira_prefetch"),
+            workers,
+            async_fetcher,
+            disk_cache,
+            getattr(config, "workerinput", {}).get("jira_shared_dir"),
+            config.getvalue("jira_cache_refresh"),
+            config.getvalue("jira_snapshot_write"),
+            stats,
+            config.getvalue("jira_stats_threshold"),
+            tracer,
+            config.getvalue("jira_resolve_after_deselect"),
+            config.getvalue("jira_fetch_during_collection"),
         )
+        if snapshot:
+            jira_plugin.load_snapshot(*snapshot)
         ok = config.pluginmanager.register(jira_plugin, PLUGIN_NAME)
         assert ok
 
 
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_setupnodes(config, specs):
+    """
+    Executed on the xdist controller before the workers are started, the
+    workers inherit the parsed jira.cfg files by the environment.
+    """
+    os.environ[CONFIG_CACHE_ENV_VAR] = _config_env(config.rootdir)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_configure_node(node):
+    """
+    Executed on the xdist controller, pass the credentials to the workers
+    outside of the environment.
+    """
+    node.workerinput["jira_credentials"] = dict(
+        (name, node.config.getvalue("jira_%s" % name))
+        for name in CONFIG_SECRETS
+    )
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodeready(node):
+    # All workers were started, do not leak the variable to the tests
+    os.environ.pop(CONFIG_CACHE_ENV_VAR, None)
+
+
 @pytest.fixture
 def jira_issue(request):
     """
@@ -0,0 +1,188 @@
+"""
+Collection-scale benchmark of the plugin.
+
+Generates synthetic test trees and collects them against a local fake Jira,
+recording the wall time of the collection phase and of the
+pytest_collection_modifyitems hooks, the number of requests made to Jira and
+the peak memory of the pytest process.
+
+    python tests/bench_collection.py --items 1000 10000 100000
+"""
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+
+from fake_jira import FakeJiraServer, make_corpus
+
+CONFTEST = """
+import json
+import os
+import resource
+import time
+
+import pytest
+
+TIMES = {}
+
+
+def pytest_collection(session):
+    TIMES["collection"] = time.perf_counter()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_collection_modifyitems(session, config, items):
+    start = time.perf_counter()
+    yield
+    TIMES["modifyitems"] = time.perf_counter() - start
+
+
+def pytest_collection_finish(session):
+    result = {
+        "items": len(session.items),
+        "collection": time.perf_counter() - TIMES["collection"],
+        "modifyitems": TIMES.get("modifyitems", 0),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    with open(os.environ["JIRA_BENCH_RESULT"], "w") as f:
+        json.dump(result, f)
+"""
+
+
+def generate_tree(
+    path,
+    items,
+    fanout=10,
+    marker_density=0.5,
+    docstring_density=0.1,
+    unique_issues=100,
+    functions_per_file=200,
+):
+    """
+    Write a test tree with about `items` items into `path`.  Every test
+    function is parametrized with `fanout` instances, `marker_density` and
+    `docstring_density` are the fractions of functions referencing an issue
+    by a marker or in the docstring.  Returns the referenced issue IDs.
+    """
+    functions = max(items // fanout, 1)
+    issue_ids = set()
+    lines = []
+    for i in range(functions):
+        if i % functions_per_file == 0 and lines:
+            _write_module(path, i // functions_per_file - 1, lines)
+            lines = []
+        issue_id = "BENCH-%d" % (i % unique_issues + 1)
+        if (i * 37) % 100 < marker_density * 100:
+            lines.append("@pytest.mark.jira(%r)" % issue_id)
+            issue_ids.add(issue_id)
+        lines.append("@pytest.mark.parametrize('i', range(%d))" % fanout)
+        lines.append("def test_%d(i):" % i)
+        if (i * 53) % 100 < docstring_density * 100:
+            issue_id = "BENCH-%d" % ((i * 7) % unique_issues + 1)
+            lines.append('    """Covers %s"""' % issue_id)
+            issue_ids.add(issue_id)
+        lines.append("    pass")
+        lines.append("")
+    _write_module(path, (functions - 1) // functions_per_file, lines)
+    with open(os.path.join(path, "conftest.py"), "w") as f:
+        f.write(CONFTEST)
+    return issue_ids
+
+
+def _write_module(path, index, lines):
+    with open(os.path.join(path, "test_bench_%d.py" % index), "w") as f:
+        f.write("import pytest\n\n\n" + "\n".join(lines))
+
+
+def run_benchmark(path, server, items, pytest_args=(), **tree_options):
+    """
+    Collect a generated tree of `items` items in a new pytest process and
+    return the measurements.
+    """
+    os.makedirs(path)
+    generate_tree(path, items, **tree_options)
+    result_path = os.path.join(path, "result.json")
+    env = dict(os.environ, JIRA_BENCH_RESULT=result_path)
+    env.pop("PYTEST_ADDOPTS", None)
+    del server.requests[:]
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pytest",
+            "--collect-only",
+            "-q",
+            "-p",
+            "no:cacheprovider",
+            "--jira",
+            "--jira-url",
+            server.url,
+        ]
+        + list(pytest_args),
+        cwd=path,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    with open(result_path) as f:
+        result = json.load(f)
+    result["requests"] = len(server.requests)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--items", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    parser.add_argument("--fanout", type=int, default=10)
+    parser.add_argument("--marker-density", type=float, default=0.5)
+    parser.add_argument("--docstring-density", type=float, default=0.1)
+    parser.add_argument("--unique-issues", type=int, default=100)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0,
+        help="Seconds every request to the fake Jira is delayed by",
+    )
+    parser.add_argument(
+        "--pytest-args",
+        default="",
+        help="Additional arguments for pytest, e.g. '--jira-workers 8'",
+    )
+    parser.add_argument("--json", action="store_true", help="JSON output")
+    args = parser.parse_args()
+
+    results = []
+    corpus = make_corpus(args.unique_issues)
+    with FakeJiraServer(corpus, latency=args.latency) as server:
+        with tempfile.TemporaryDirectory() as tmp:
+            for items in args.items:
+                result = run_benchmark(
+                    os.path.join(tmp, str(items)),
+                    server,
+                    items,
+                    shlex.split(args.pytest_args),
+                    fanout=args.fanout,
+                    marker_density=args.marker_density,
+                    docstring_density=args.docstring_density,
+                    unique_issues=args.unique_issues,
+                )
+                results.append(result)
+                if not args.json:
+                    print(
+                        "%(items)8d items  collection %(collection)7.3fs  "
+                        "modifyitems %(modifyitems)7.3fs  "
+                        "requests %(requests)5d  "
+                        "max rss %(max_rss_kb)8d kB" % result
+                    )
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
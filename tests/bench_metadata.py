@@ -0,0 +1,71 @@
+"""
+Microbenchmark of the lookups of issues with --jira-return-metadata.
+
+Compares evaluating a cached issue with a new schema for every lookup, with
+a single reused schema, and the memoized lookup of JiraHooks.
+
+    python tests/bench_metadata.py --lookups 10000
+"""
+
+import argparse
+import timeit
+
+from fake_jira import make_issue
+
+from issue_model import JiraIssue, JiraIssueSchema
+from pytest_jira import JiraHooks, JiraMarkerReporter, _issue_schema
+
+FIELDS = dict(
+    make_issue(
+        "Closed",
+        resolution="Done",
+        components=["com1", "com2"],
+        versions=["1.0"],
+        fix_versions=["1.1"],
+    ),
+    summary="Benchmark issue",
+    labels=["benchmark"],
+)
+
+
+def new_schema():
+    return JiraIssue("BENCH-1", **JiraIssueSchema().dump(FIELDS))
+
+
+def shared_schema():
+    return JiraIssue("BENCH-1", **_issue_schema().dump(FIELDS))
+
+
+def make_hooks():
+    hooks = JiraHooks(
+        None, JiraMarkerReporter("open", True, None), return_jira_metadata=True
+    )
+    hooks.issue_cache["BENCH-1"] = FIELDS
+    return hooks
+
+
+def run(lookups):
+    """Return the seconds per lookup by the name of the path."""
+    hooks = make_hooks()
+    paths = [
+        ("new schema per lookup", new_schema),
+        ("shared schema", shared_schema),
+        ("memoized lookup", lambda: hooks.is_issue_resolved("BENCH-1")),
+    ]
+    return dict(
+        (name, min(timeit.repeat(func, number=lookups, repeat=3)) / lookups)
+        for name, func in paths
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lookups", type=int, default=10000)
+    args = parser.parse_args()
+
+    for name, seconds in run(args.lookups).items():
+        print("%-22s %10.2f us" % (name, seconds * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Memory benchmark of the parsed issues kept in the issue cache.
+
+Decodes a synthetic corpus of issues from JSON, like the responses of Jira,
+and compares the memory held by plain dicts of sets with the memory held by
+the compact records produced by the plugin.
+
+    python tests/bench_records.py --issues 100000
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+
+from fake_jira import make_corpus
+
+from pytest_jira import JiraIssueRecord, JiraSiteConnection
+
+
+def parse_dict(field):
+    """Parsed issue as returned by the plugin before compact records."""
+    return {
+        "components": set(c["name"] for c in field.get("components", set())),
+        "versions": set(v["name"] for v in field.get("versions", set())),
+        "fixed_versions": set(
+            v["name"] for v in field.get("fixVersions", set())
+        ),
+        "status": field["status"]["name"].lower(),
+        "resolution": (
+            field["resolution"]["name"].lower() if field["resolution"] else None
+        ),
+    }
+
+
+def parse_record(field):
+    return JiraSiteConnection._parse_fields(field, False)
+
+
+def measure(responses, parse):
+    """
+    Return the bytes allocated by the issue cache holding the parsed
+    `responses`.
+    """
+    gc.collect()
+    tracemalloc.start()
+    cache = dict(
+        (issue_id, parse(json.loads(body)["fields"]))
+        for issue_id, body in responses
+    )
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(cache) == len(responses)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--issues", type=int, default=100000)
+    args = parser.parse_args()
+
+    responses = [
+        (issue_id, json.dumps({"key": issue_id, "fields": fields}))
+        for issue_id, fields in make_corpus(args.issues).items()
+    ]
+    dicts = measure(responses, parse_dict)
+    JiraIssueRecord._sets.clear()
+    records = measure(responses, parse_record)
+    print("%8d issues" % args.issues)
+    print("dicts of sets  %8.1f MB" % (dicts / 1e6))
+    print("records        %8.1f MB" % (records / 1e6))
+    print("saved          %8.1f %%" % (100.0 * (dicts - records) / dicts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+# The plugin imports issue_model and requests on first use.  Import them
+# here, so they are not dropped from sys.modules after inline pytester runs
+# while the plugin still holds references to them.
+import pytest
+import requests  # noqa: F401
+from fake_jira import FakeJiraServer
+
+import issue_model  # noqa: F401
+
+
+@pytest.fixture
+def jira_server():
+    """
+    Local stand-in for Jira, see fake_jira.FakeJiraServer for injecting
+    latency and faults.
+    """
+    with FakeJiraServer() as server:
+        yield server
@@ -0,0 +1,235 @@
+"""
+Local stand-in for the parts of the Jira REST API used by the plugin.
+
+The server serves the ``/rest/api/2/myself``, ``/rest/api/2/issue/{id}`` and
+``/rest/api/2/search`` endpoints from an in-memory issue corpus.  Every
+request can be delayed by a fixed latency and faults can be injected into the
+following requests: rate limiting (429 with Retry-After), server errors,
+truncated JSON bodies and bodies sent slowly byte by byte.
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FAULTS = "rate_limit", "server_error", "truncate", "slow_drip"
+
+
+def project(fields, query):
+    """Keep only the fields requested by the ``fields`` parameter."""
+    if "fields" not in query:
+        return fields
+    names = query["fields"][0].split(",")
+    return dict((k, v) for k, v in fields.items() if k in names)
+
+
+def make_issue(
+    status="Open",
+    resolution=None,
+    components=(),
+    versions=(),
+    fix_versions=(),
+):
+    """Return the ``fields`` of a Jira issue document."""
+    return {
+        "status": {"name": status},
+        "resolution": {"name": resolution} if resolution else None,
+        "components": [{"name": c} for c in components],
+        "versions": [{"name": v} for v in versions],
+        "fixVersions": [{"name": v} for v in fix_versions],
+    }
+
+
+def make_corpus(count, project="BENCH", seed=0):
+    """
+    Return `count` issues with IDs ``<project>-1`` to ``<project>-<count>``.
+    Statuses, resolutions, components and versions are drawn from a random
+    generator initialized by `seed`, so the corpus is reproducible.
+    """
+    rnd = random.Random(seed)
+    issues = {}
+    for i in range(1, count + 1):
+        closed = rnd.random() < 0.3
+        versions = rnd.sample(["1.0", "1.1", "1.2", "2.0"], rnd.randint(0, 2))
+        issues["%s-%d" % (project, i)] = make_issue(
+            "Closed" if closed else rnd.choice(["Open", "In Progress"]),
+            resolution=rnd.choice(["Done", "Won't Fix"]) if closed else None,
+            components=["component-%d" % rnd.randint(0, 9)],
+            versions=versions,
+            fix_versions=versions[:1] if closed else [],
+        )
+    return issues
+
+
+class Fault(object):
+    def __init__(self, kind, count, path, options):
+        if kind not in FAULTS:
+            raise ValueError("Unknown fault %r" % kind)
+        self.kind = kind
+        self.count = count
+        self.path = path
+        self.options = options
+
+
+class FakeJiraHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.server.log_request(url.path, query, self.headers)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        fault = self.server.next_fault(url.path)
+        if fault and fault.kind == "rate_limit":
+            self.send_json(
+                429,
+                {"errorMessages": ["Rate limit exceeded"]},
+                {"Retry-After": str(fault.options.get("retry_after", 1))},
+            )
+        elif fault and fault.kind == "server_error":
+            self.send_json(
+                fault.options.get("status", 503),
+                {"errorMessages": ["Service unavailable"]},
+            )
+        else:
+            status, payload = self.route(url.path, query)
+            self.send_json(status, payload, fault=fault)
+
+    def route(self, path, query):
+        issues = self.server.issues
+        if path == "/rest/api/2/myself":
+            return 200, {"name": "tester"}
+        if path.startswith("/rest/api/2/issue/"):
+            issue_id = path.rsplit("/", 1)[1]
+            if issue_id not in issues:
+                return 404, {"errorMessages": ["Issue does not exist"]}
+            fields = project(issues[issue_id], query)
+            return 200, {"key": issue_id, "fields": fields}
+        if path == "/rest/api/2/search":
+            jql = query["jql"][0]
+            keys = re.findall(
+                r'"([^"]+)"', re.search(r"key in \(([^)]*)\)", jql).group(1)
+            )
+            since = re.search(r'updated >= "-(\d+)m"', jql)
+            found = [
+                {"key": key, "fields": project(issues[key], query)}
+                for key in keys
+                if key in issues
+                and (
+                    not since
+                    or self.server.updated.get(key, 0)
+                    >= time.time() - int(since.group(1)) * 60
+                )
+            ]
+            max_results = min(
+                int(query.get("maxResults", [50])[0]), self.server.max_results
+            )
+            return 200, {
+                "total": len(found),
+                "maxResults": max_results,
+                "issues": found[:max_results],
+            }
+        return 404, {"errorMessages": ["Not found"]}
+
+    def send_json(self, status, payload, headers=None, fault=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if fault and fault.kind == "truncate":
+            body = body[: len(body) // 2]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if fault and fault.kind == "slow_drip":
+            delay = fault.options.get("delay", 0.01)
+            for i in range(len(body)):
+                self.wfile.write(body[i : i + 1])
+                self.wfile.flush()
+                time.sleep(delay)
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeJiraServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, issues=None, latency=0):
+        super().__init__(("127.0.0.1", 0), FakeJiraHandler)
+        self.issues = dict(issues or {})
+        # Time of the last update by issue ID, for "updated >=" searches
+        self.updated = {}
+        # Seconds every request is delayed by
+        self.latency = latency
+        # Limit of issues returned by a single search, like on Jira Cloud
+        self.max_results = 100
+        self.requests = []
+        self.faults = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on slow responses are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        return "http://%s:%s" % self.server_address[:2]
+
+    def inject(self, kind, count=1, path="/", **options):
+        """
+        Inject a fault into the next `count` requests with a path starting
+        with `path`.  Faults are applied in the order they were injected.
+
+        * ``rate_limit`` - 429 response with a ``retry_after`` header
+        * ``server_error`` - response with ``status`` (503 by default)
+        * ``truncate`` - only the first half of the JSON body is sent
+        * ``slow_drip`` - body is sent byte by byte, ``delay`` seconds apart
+        """
+        with self._lock:
+            self.faults.append(Fault(kind, count, path, options))
+
+    def next_fault(self, path):
+        with self._lock:
+            for fault in self.faults:
+                if path.startswith(fault.path):
+                    fault.count -= 1
+                    if not fault.count:
+                        self.faults.remove(fault)
+                    return fault
+        return None
+
+    def log_request(self, path, query, headers):
+        with self._lock:
+            self.requests.append((path, query, dict(headers)))
+
+    def request_paths(self):
+        with self._lock:
+            return [path for path, _, _ in self.requests]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -1,7 +1,12 @@
+import json
 import os
 import re
+import subprocess
+import sys
+import time
 
 import pytest
+import requests
 from packaging.version import Version
 
 PUBLIC_JIRA_SERVER = "https://redhat.atlassian.net"
@@ -1497,3 +1502,2003 @@ def test_closed_fixed_option(testdir):
     )
     result = testdir.runpytest(*ARGS)
     result.assert_outcomes(1, 0, 0)
+
+
+class FakeResponse(object):
+    def __init__(self, payload):
+        self.payload = payload
+        self.content = json.dumps(payload).encode()
+
+    def json(self):
+        return self.payload
+
+
+class TestJiraPrefetch:
+    """Unit tests for batched JQL prefetch of issues."""
+
+    def test_get_issues_search(self, monkeypatch):
+        from pytest_jira import JiraSiteConnection
+
+        conn = JiraSiteConnection(url="http://jira.example.com")
+        conn.is_connected = True
+        requests_made = []
+
+        def fake_request(url, **kwargs):
+            requests_made.append((url, kwargs))
+            return FakeResponse(
+                {
+                    "issues": [
+                        {
+                            "key": "ORG-1",
+                            "fields": {
+                                "components": [{"name": "com1"}],
+                                "status": {"name": "Closed"},
+                                "resolution": {"name": "Done"},
+                            },
+                        }
+                    ]
+                }
+            )
+
+        monkeypatch.setattr(conn, "_jira_request", fake_request)
+        issues = conn.get_issues(["ORG-1", "ORG-2"], False)
+        assert issues == {
+            "ORG-1": {
+                "components": {"com1"},
+                "versions": set(),
+                "fixed_versions": set(),
+                "status": "closed",
+                "resolution": "done",
+            }
+        }
+        url, kwargs = requests_made[0]
+        assert url == "http://jira.example.com/rest/api/2/search"
+        assert kwargs["params"]["jql"] == 'key in ("ORG-1","ORG-2")'
+        assert kwargs["params"]["maxResults"] == 2
+        assert kwargs["params"]["fields"] == (
+            "components,versions,fixVersions,status,resolution"
+        )
+
+    def test_chunks_limits(self):
+        from pytest_jira import (
+            SEARCH_MAX_JQL_LENGTH,
+            SEARCH_MAX_RESULTS,
+            _chunks,
+            _issue_keys_jql,
+        )
+
+        issue_ids = ["ORG-%d" % i for i in range(1000)]
+        chunks = list(_chunks(issue_ids))
+        assert sum(chunks, []) == issue_ids
+        assert all(len(c) <= SEARCH_MAX_RESULTS for c in chunks)
+        long_ids = ["LONGPROJECTNAME-%d" % i for i in range(1000)]
+        for chunk in _chunks(long_ids):
+            assert len(_issue_keys_jql(chunk)) <= SEARCH_MAX_JQL_LENGTH
+
+    def test_prefetch_fills_cache(self):
+        from pytest_jira import JiraHooks, JiraMarkerReporter
+
+        class FakeConnection(object):
+            searches = []
+
+            def get_issues(self, issue_ids, return_jira_metadata):
+                self.searches.append(issue_ids)
+                return {"ORG-2": {"status": "closed"}}
+
+        conn = FakeConnection()
+        hooks = JiraHooks(conn, JiraMarkerReporter("open", True, None))
+        hooks.issue_cache["ORG-1"] = {"status": "open"}
+        hooks.prefetch_issues(["ORG-1", "ORG-2", "ORG-3", "ORG-2"])
+        assert conn.searches == [["ORG-2", "ORG-3"]]
+        assert hooks.issue_cache == {
+            "ORG-1": {"status": "open"},
+            "ORG-2": {"status": "closed"},
+        }
+
+    def test_prefetch_falls_back_on_error(self):
+        import requests
+
+        from pytest_jira import JiraHooks, JiraMarkerReporter
+
+        class FakeConnection(object):
+            def get_issues(self, issue_ids, return_jira_metadata):
+                raise requests.ConnectionError("search unavailable")
+
+        hooks = JiraHooks(
+            FakeConnection(), JiraMarkerReporter("open", True, None)
+        )
+        hooks.prefetch_issues(["ORG-1"])
+        assert hooks.issue_cache == {}
+
+
+class TestJiraWorkers:
+    """Unit tests for concurrent issue fetching."""
+
+    def test_fetch_issues_concurrently(self):
+        import threading
+
+        import requests
+
+        from pytest_jira import JiraHooks, JiraMarkerReporter
+
+        class FakeConnection(object):
+            is_connected = True
+
+            def __init__(self):
+                self.threads = set()
+                self.barrier = threading.Barrier(4, timeout=5)
+
+            def get_issue(self, issue_id, return_jira_metadata):
+                self.threads.add(threading.current_thread().name)
+                # Every worker has to be busy at the same time
+                self.barrier.wait()
+                if issue_id == "ORG-4":
+                    response = requests.Response()
+                    response.status_code = 404
+                    raise requests.HTTPError("not found", response=response)
+                if issue_id == "ORG-3":
+                    raise requests.ConnectionError("connection reset")
+                return {"status": "closed"}
+
+        conn = FakeConnection()
+        hooks = JiraHooks(
+            conn, JiraMarkerReporter("open", True, None), workers=4
+        )
+        hooks.fetch_issues(["ORG-1", "ORG-2", "ORG-3", "ORG-4"])
+        assert len(conn.threads) == 4
+        assert hooks.issue_cache == {
+            "ORG-1": {"status": "closed"},
+            "ORG-2": {"status": "closed"},
+            "ORG-4": {"status": "open"},
+        }
+
+
+class TestJiraAsyncFetcher:
+    """Unit tests for the asyncio fetch engine."""
+
+    def test_fetch_issues(self):
+        pytest.importorskip("aiohttp")
+        from fake_jira import FakeJiraServer, make_issue
+
+        from pytest_jira import JiraAsyncFetcher, JiraSiteConnection
+
+        issues = dict(
+            ("ORG-%d" % i, make_issue("Closed", components=["com1"]))
+            for i in range(50)
+        )
+        with FakeJiraServer(issues) as server:
+            conn = JiraSiteConnection(server.url, token="secret", timeout=5)
+            fetcher = JiraAsyncFetcher(conn, concurrency=8)
+            results = fetcher.fetch(sorted(issues) + ["ORG-404"], False)
+            requests_made = list(server.requests)
+        assert results["ORG-0"] == {
+            "components": {"com1"},
+            "versions": set(),
+            "fixed_versions": set(),
+            "status": "closed",
+            "resolution": None,
+        }
+        assert results["ORG-404"].response.status_code == 404
+        assert len(requests_made) == 51
+        assert all(
+            headers["Authorization"] == "Bearer secret"
+            for _, _, headers in requests_made
+        )
+
+    def test_fetch_through_proxy(self, monkeypatch):
+        pytest.importorskip("aiohttp")
+        from fake_jira import FakeJiraServer, make_issue
+
+        from pytest_jira import JiraAsyncFetcher, JiraSiteConnection
+
+        with FakeJiraServer({"ORG-1": make_issue("Closed")}) as server:
+            monkeypatch.setenv("HTTP_PROXY", server.url)
+            monkeypatch.delenv("NO_PROXY", raising=False)
+            monkeypatch.delenv("no_proxy", raising=False)
+            conn = JiraSiteConnection("http://jira.invalid", timeout=5)
+            results = JiraAsyncFetcher(conn).fetch(["ORG-1"], False)
+            paths = server.request_paths()
+        assert results["ORG-1"]["status"] == "closed"
+        assert paths == ["/rest/api/2/issue/ORG-1"]
+
+    @pytest.mark.parametrize("verify", [True, "configured"])
+    def test_ssl_context_ca_bundle(self, tmpdir, monkeypatch, verify):
+        pytest.importorskip("aiohttp")
+        import ssl
+
+        import requests
+
+        from pytest_jira import JiraAsyncFetcher, JiraSiteConnection
+
+        bundle = tmpdir.join("ca.pem")
+        with open(requests.utils.DEFAULT_CA_BUNDLE_PATH) as f:
+            bundle.write(f.read())
+        if verify == "configured":
+            verify = str(bundle)
+        else:
+            monkeypatch.setenv("REQUESTS_CA_BUNDLE", str(bundle))
+        calls = []
+        create_default_context = ssl.create_default_context
+
+        def record(**kwargs):
+            calls.append(kwargs)
+            return create_default_context(**kwargs)
+
+        monkeypatch.setattr(ssl, "create_default_context", record)
+        conn = JiraSiteConnection("https://jira", verify=verify)
+        assert isinstance(JiraAsyncFetcher(conn)._ssl_context(), ssl.SSLContext)
+        assert calls == [{"cafile": str(bundle)}]
+
+    def test_plugin_async_fetch(self, testdir):
+        pytest.importorskip("aiohttp")
+        from fake_jira import FakeJiraServer, make_issue
+
+        testdir.makepyfile(
+            """
+            import pytest
+
+            @pytest.mark.jira("ORG-1")
+            def test_open():
+                assert False
+
+            @pytest.mark.jira("ORG-2")
+            def test_closed():
+                assert True
+
+            @pytest.mark.jira("ORG-3")
+            def test_missing():
+                assert False
+            """
+        )
+        issues = {"ORG-1": make_issue("Open"), "ORG-2": make_issue("Closed")}
+        with FakeJiraServer(issues) as server:
+            result = testdir.runpytest(
+                "--jira",
+                "--jira-url",
+                server.url,
+                "--jira-async",
+                "--jira-disable-prefetch",
+            )
+            paths = server.request_paths()
+        assert_outcomes(result, 1, 0, 0, xfailed=2)
+        assert sorted(paths) == [
+            "/rest/api/2/issue/ORG-1",
+            "/rest/api/2/issue/ORG-2",
+            "/rest/api/2/issue/ORG-3",
+            "/rest/api/2/myself",
+        ]
+
+
+def test_persistent_cache(testdir):
+    from fake_jira import FakeJiraServer, make_issue
+
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        def test_open():
+            assert False
+
+        @pytest.mark.jira("ORG-2")
+        def test_closed():
+            assert True
+        """
+    )
+    issues = {"ORG-1": make_issue("Open"), "ORG-2": make_issue("Closed")}
+    with FakeJiraServer(issues) as server:
+        args = ("--jira", "--jira-url", server.url, "--jira-cache-ttl", "3600")
+        result = testdir.runpytest(*args)
+        assert_outcomes(result, 1, 0, 0, xfailed=1)
+        assert len(server.requests) == 2
+
+        # Fresh entries are served from the cache
+        del server.requests[:]
+        result = testdir.runpytest(*args)
+        assert_outcomes(result, 1, 0, 0, xfailed=1)
+        assert server.requests == []
+
+        # Expired entries are fetched again
+        result = testdir.runpytest(
+            "--jira", "--jira-url", server.url, "--jira-cache-ttl", "0.001"
+        )
+        assert_outcomes(result, 1, 0, 0, xfailed=1)
+        assert len(server.requests) == 2
+
+        del server.requests[:]
+        result = testdir.runpytest(*(args + ("--jira-cache-clear",)))
+        assert_outcomes(result, 1, 0, 0, xfailed=1)
+        assert len(server.requests) == 2
+
+
+def test_persistent_cache_roundtrip(tmpdir):
+    from pytest_jira import JiraIssueCache
+
+    cache = JiraIssueCache(str(tmpdir.join("issues.sqlite")), 3600)
+    issue = {
+        "components": {"com1", "com2"},
+        "versions": set(),
+        "fixed_versions": {"foo-0.2"},
+        "status": "closed",
+        "resolution": None,
+    }
+    cache.set_many("http://jira", {"ORG-1": issue}, False)
+    assert cache.get_many("http://jira", ["ORG-1", "ORG-2"], False) == {
+        "ORG-1": issue
+    }
+    assert cache.get_many("http://other", ["ORG-1"], False) == {}
+    assert cache.get_many("http://jira", ["ORG-1"], True) == {}
+    cache.clear()
+    assert cache.get_many("http://jira", ["ORG-1"], False) == {}
+    cache.close()
+
+
+def test_xdist_resolves_issues_once(testdir):
+    pytest.importorskip("xdist")
+    from fake_jira import FakeJiraServer, make_issue
+
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        @pytest.mark.parametrize("i", range(6))
+        def test_open(i):
+            assert False
+
+        @pytest.mark.jira("ORG-2")
+        @pytest.mark.parametrize("i", range(6))
+        def test_closed(i):
+            assert True
+        """
+    )
+    issues = {"ORG-1": make_issue("Open"), "ORG-2": make_issue("Closed")}
+    with FakeJiraServer(issues) as server:
+        result = testdir.runpytest_subprocess(
+            "--jira", "--jira-url", server.url, "-n", "3"
+        )
+        paths = server.request_paths()
+    assert_outcomes(result, 6, 0, 0, xfailed=6)
+    assert sorted(paths) == ["/rest/api/2/myself", "/rest/api/2/search"]
+
+
+def test_xdist_outage_requested_once(testdir, jira_server):
+    pytest.importorskip("xdist")
+    jira_server.inject("server_error", count=1000)
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        @pytest.mark.parametrize("i", range(6))
+        def test_issue(i):
+            pass
+        """
+    )
+    result = testdir.runpytest_subprocess(
+        "--jira",
+        "--jira-url",
+        jira_server.url,
+        "--jira-connection-retry-total",
+        "0",
+        "--jira-connection-error-strategy",
+        "skip",
+        "-n",
+        "3",
+    )
+    result.assert_outcomes(skipped=6)
+    # Authentication failed in the worker resolving issues, the others
+    # apply the strategy to its error
+    assert jira_server.request_paths() == ["/rest/api/2/myself"] * 2
+
+
+def test_shared_issues_follower(tmpdir):
+    from pytest_jira import JiraHooks, JiraMarkerReporter
+
+    class FakeConnection(object):
+        lookups = 0
+
+        def get_url(self):
+            return "http://jira"
+
+        def get_issues(self, issue_ids, return_jira_metadata):
+            self.lookups += 1
+            return dict((i, {"status": "closed"}) for i in issue_ids)
+
+    conn = FakeConnection()
+    marker = JiraMarkerReporter("open", True, None)
+    leader = JiraHooks(conn, marker, shared_dir=str(tmpdir))
+    leader.resolve_shared_issues({"ORG-1", "ORG-2"})
+    follower = JiraHooks(conn, marker, shared_dir=str(tmpdir))
+    follower.resolve_shared_issues({"ORG-1", "ORG-2"})
+    assert conn.lookups == 1
+    assert follower.issue_cache == leader.issue_cache
+
+
+def test_shared_issues_errors(tmpdir):
+    from pytest_jira import JiraHooks, JiraMarkerReporter, _http_error
+
+    class FailingConnection(object):
+        is_connected = True
+        lookups = 0
+
+        def get_url(self):
+            return "http://jira"
+
+        def get_issues(self, issue_ids, return_jira_metadata):
+            self.lookups += 1
+            raise requests.ConnectionError("Jira is down")
+
+        def get_issue(self, issue_id, return_jira_metadata):
+            self.lookups += 1
+            if issue_id == "ORG-404":
+                raise _http_error(404, "Not Found", "http://jira")
+            raise requests.ConnectionError("Jira is down")
+
+    conn = FailingConnection()
+    marker = JiraMarkerReporter("open", True, None)
+    leader = JiraHooks(conn, marker, shared_dir=str(tmpdir))
+    leader.resolve_shared_issues({"ORG-1", "ORG-404"})
+    assert conn.lookups == 3
+    follower = JiraHooks(conn, marker, shared_dir=str(tmpdir))
+    follower.resolve_shared_issues({"ORG-1", "ORG-404"})
+    # Failures are reported by every worker, but requested only once
+    with pytest.raises(requests.ConnectionError, match="Jira is down"):
+        follower.is_issue_resolved("ORG-1")
+    assert follower.is_issue_resolved("ORG-404") is False
+    with pytest.raises(requests.ConnectionError, match="Jira is down"):
+        leader.is_issue_resolved("ORG-1")
+    assert conn.lookups == 3
+
+
+def test_shared_issues_leader_gone(tmpdir):
+    from pytest_jira import JiraHooks, JiraMarkerReporter
+
+    class FakeConnection(object):
+        def get_url(self):
+            return "http://jira"
+
+        def get_issues(self, issue_ids, return_jira_metadata):
+            return dict((i, {"status": "closed"}) for i in issue_ids)
+
+    gone = subprocess.Popen([sys.executable, "-c", "pass"])
+    gone.wait()
+    tmpdir.join("lock").write(str(gone.pid))
+    follower = JiraHooks(
+        FakeConnection(),
+        JiraMarkerReporter("open", True, None),
+        shared_dir=str(tmpdir),
+    )
+    start = time.time()
+    follower.resolve_shared_issues({"ORG-1"})
+    assert time.time() - start < 5
+    assert follower.issue_cache["ORG-1"] == {"status": "closed"}
+
+
+def test_shared_issues_remote_worker(tmpdir):
+    from pytest_jira import JiraHooks, JiraMarkerReporter
+
+    class FakeConnection(object):
+        def get_url(self):
+            return "http://jira"
+
+        def get_issues(self, issue_ids, return_jira_metadata):
+            return dict((i, {"status": "closed"}) for i in issue_ids)
+
+    # The directory of the controller does not exist on another host
+    hooks = JiraHooks(
+        FakeConnection(),
+        JiraMarkerReporter("open", True, None),
+        shared_dir=str(tmpdir.join("controller")),
+    )
+    hooks.resolve_shared_issues({"ORG-1"})
+    assert hooks.issue_cache["ORG-1"] == {"status": "closed"}
+
+
+@pytest.mark.parametrize("return_jira_metadata", [False, True])
+def test_get_issue_requests_used_fields(return_jira_metadata):
+    from fake_jira import FakeJiraServer, make_issue
+
+    from issue_model import JiraIssueSchema
+    from pytest_jira import JiraSiteConnection
+
+    fields = make_issue("Closed", components=["com1"])
+    fields.update(summary="Summary", description="Long description")
+    with FakeJiraServer({"ORG-1": fields}) as server:
+        conn = JiraSiteConnection(server.url)
+        issue = conn.get_issue("ORG-1", return_jira_metadata)
+        _, query, headers = server.requests[-1]
+    requested = query["fields"][0].split(",")
+    assert "gzip" in headers["Accept-Encoding"]
+    if return_jira_metadata:
+        assert requested == list(JiraIssueSchema._declared_fields)
+        assert issue["summary"] == "Summary"
+        assert "description" not in issue
+    else:
+        assert "summary" not in requested
+        assert issue["status"] == "closed"
+
+
+def test_persistent_cache_refresh(testdir):
+    import time
+
+    from fake_jira import FakeJiraServer, make_issue
+
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        def test_one():
+            assert True
+
+        @pytest.mark.jira("ORG-2")
+        def test_two():
+            assert True
+        """
+    )
+    issues = {"ORG-1": make_issue("Open"), "ORG-2": make_issue("Open")}
+    with FakeJiraServer(issues) as server:
+        args = (
+            "--jira",
+            "--jira-url",
+            server.url,
+            "--jira-cache-ttl",
+            "0.001",
+            "--jira-cache-refresh",
+        )
+        result = testdir.runpytest(*args)
+        assert_outcomes(result, 0, 0, 0, xpassed=2)
+
+        # Nothing changed, expired entries are revalidated by a search for
+        # updated issues and a search confirming the others still exist
+        del server.requests[:]
+        result = testdir.runpytest(*args)
+        assert_outcomes(result, 0, 0, 0, xpassed=2)
+        searches = [q for p, q, _ in server.requests if p.endswith("search")]
+        assert len(searches) == 2
+        assert 'updated >= "-' in searches[0]["jql"][0]
+        assert "updated" not in searches[1]["jql"][0]
+        assert searches[1]["fields"] == ["key"]
+
+        server.issues["ORG-1"] = make_issue("Closed")
+        server.updated["ORG-1"] = time.time()
+        result = testdir.runpytest(*args)
+        assert_outcomes(result, 1, 0, 0, xpassed=1)
+
+
+@pytest.mark.parametrize("hard_ttl", [None, "3600"])
+def test_persistent_cache_refresh_deleted(testdir, hard_ttl):
+    from fake_jira import FakeJiraServer, make_issue
+
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        def test_one():
+            assert False
+        """
+    )
+    with FakeJiraServer({"ORG-1": make_issue("Closed")}) as server:
+        args = [
+            "--jira",
+            "--jira-url",
+            server.url,
+            "--jira-cache-ttl",
+            "0.001",
+            "--jira-cache-refresh",
+        ]
+        if hard_ttl:
+            args += ["--jira-cache-hard-ttl", hard_ttl]
+        result = testdir.runpytest(*args)
+        assert_outcomes(result, 0, 0, 1)
+
+        # A deleted issue is not renewed, but fetched and not found
+        del server.issues["ORG-1"]
+        if hard_ttl:
+            # Served stale once, the revalidation drops it from the cache
+            result = testdir.runpytest(*args)
+            assert_outcomes(result, 0, 0, 1)
+        for _ in range(3):
+            del server.requests[:]
+            result = testdir.runpytest(*args)
+            assert_outcomes(result, 0, 0, 0, xfailed=1)
+            assert "/rest/api/2/issue/ORG-1" in server.request_paths()
+
+
+def test_persistent_cache_stale(testdir):
+    from fake_jira import FakeJiraServer, make_issue
+
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        def test_one():
+            assert False
+        """
+    )
+    with FakeJiraServer({"ORG-1": make_issue("Open")}) as server:
+        args = (
+            "--jira",
+            "--jira-url",
+            server.url,
+            "--jira-cache-ttl",
+            "0.001",
+            "--jira-cache-hard-ttl",
+            "3600",
+        )
+        result = testdir.runpytest(*args)
+        assert_outcomes(result, 0, 0, 0, xfailed=1)
+        result.stdout.no_fnmatch_line("*served stale*")
+
+        # The stale issue is used and refreshed for the next session
+        server.issues["ORG-1"] = make_issue("Closed")
+        del server.requests[:]
+        result = testdir.runpytest(*args)
+        assert_outcomes(result, 0, 0, 0, xfailed=1)
+        result.stdout.fnmatch_lines(
+            ["*Jira issues served stale*", "ORG-1 fetched *s ago"]
+        )
+        assert server.request_paths() == [
+            "/rest/api/2/myself",
+            "/rest/api/2/search",
+        ]
+
+        result = testdir.runpytest(*args)
+        assert_outcomes(result, 0, 0, 1)
+
+        # Issues past the hard TTL are fetched before they are used
+        server.issues["ORG-1"] = make_issue("Open")
+        result = testdir.runpytest(*(args[:-1] + ("0.002",)))
+        assert_outcomes(result, 0, 0, 0, xfailed=1)
+        result.stdout.no_fnmatch_line("*served stale*")
+
+
+def test_persistent_cache_stale_limiter(testdir, jira_server):
+    from fake_jira import make_issue
+
+    jira_server.issues["ORG-1"] = make_issue("Open")
+    testdir.makeconftest(
+        """
+        def pytest_sessionfinish(session):
+            plugin = session.config.pluginmanager.get_plugin("jira_plugin")
+            print("max concurrency", plugin.conn.limiter.max_concurrency)
+        """
+    )
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        def test_one():
+            assert False
+
+        @pytest.mark.jira("ORG-2")
+        def test_two():
+            assert False
+        """
+    )
+    args = (
+        "--jira",
+        "--jira-url",
+        jira_server.url,
+        "--jira-cache-ttl",
+        "0.001",
+        "--jira-cache-hard-ttl",
+        "3600",
+        "--jira-disable-prefetch",
+        "-s",
+    )
+    result = testdir.runpytest(*args)
+    assert_outcomes(result, 0, 0, 0, xfailed=2)
+
+    # The refresh of ORG-1 does not take the only slot for fetching ORG-2
+    jira_server.issues["ORG-2"] = make_issue("Open")
+    del jira_server.requests[:]
+    result = testdir.runpytest(*args)
+    assert_outcomes(result, 0, 0, 0, xfailed=2)
+    result.stdout.fnmatch_lines(["*max concurrency 2*"])
+    assert sorted(jira_server.request_paths()) == [
+        "/rest/api/2/issue/ORG-2",
+        "/rest/api/2/myself",
+        "/rest/api/2/search",
+    ]
+
+
+def test_persistent_cache_stale_xdist(testdir, jira_server):
+    pytest.importorskip("xdist")
+    from fake_jira import make_issue
+
+    jira_server.issues["ORG-1"] = make_issue("Open")
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        @pytest.mark.parametrize("i", range(4))
+        def test_one(i):
+            assert False
+        """
+    )
+    args = (
+        "--jira",
+        "--jira-url",
+        jira_server.url,
+        "--jira-cache-ttl",
+        "0.001",
+        "--jira-cache-hard-ttl",
+        "3600",
+    )
+    result = testdir.runpytest(*args)
+    assert_outcomes(result, 0, 0, 0, xfailed=4)
+
+    jira_server.issues["ORG-1"] = make_issue("Closed")
+    result = testdir.runpytest_subprocess(*(args + ("-n", "2")))
+    assert_outcomes(result, 0, 0, 0, xfailed=4)
+    result.stdout.fnmatch_lines(
+        ["*Jira issues served stale*", "ORG-1 fetched *s ago"]
+    )
+
+    # Refreshed by the worker before it finished
+    result = testdir.runpytest(*args)
+    assert_outcomes(result, 0, 0, 4)
+
+
+def test_persistent_cache_stale_entries(tmpdir):
+    from pytest_jira import JiraIssueCache
+
+    path = str(tmpdir.join("issues.sqlite"))
+    with pytest.raises(ValueError, match="hard TTL"):
+        JiraIssueCache(path, 3600, hard_ttl=60)
+    cache = JiraIssueCache(path, 10, hard_ttl=100)
+    issue = {"status": "closed"}
+    now = time.time()
+    for issue_id, age in ("ORG-1", 1), ("ORG-2", 50), ("ORG-3", 500):
+        cache.set_many("http://jira", {issue_id: issue}, True, now - age)
+    ids = ["ORG-1", "ORG-2", "ORG-3"]
+    assert list(cache.get_many("http://jira", ids, True)) == ["ORG-1"]
+    stale = cache.get_stale("http://jira", ids, True)
+    assert list(stale) == ["ORG-2"]
+    assert stale["ORG-2"][1] == pytest.approx(now - 50)
+    cache.close()
+
+
+def test_snapshot_write_and_read(testdir):
+    import gzip
+
+    from fake_jira import FakeJiraServer, make_issue
+
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        def test_open():
+            assert False
+
+        @pytest.mark.jira("ORG-2")
+        def test_closed():
+            assert True
+
+        def test_fixture(jira_issue):
+            assert jira_issue("ORG-1")
+            assert not jira_issue("ORG-2")
+        """
+    )
+    snapshot = str(testdir.tmpdir.join("issues.jsonl.gz"))
+    issues = {
+        "ORG-1": make_issue("Open", components=["com1"]),
+        "ORG-2": make_issue("Closed"),
+    }
+    with FakeJiraServer(issues) as server:
+        result = testdir.runpytest(
+            "--jira",
+            "--jira-url",
+            server.url,
+            "--jira-snapshot-write",
+            snapshot,
+        )
+    assert_outcomes(result, 2, 0, 0, xfailed=1)
+    with gzip.open(snapshot, "rt") as f:
+        header = json.loads(f.readline())
+        records = [json.loads(line) for line in f]
+    assert header["schema_version"] == 1
+    assert header["url"] == server.url
+    assert "created" in header
+    assert sorted(r["issue_id"] for r in records) == ["ORG-1", "ORG-2"]
+
+    # The server is gone, everything has to come from the snapshot
+    result = testdir.runpytest("--jira", "--jira-snapshot-read", snapshot)
+    assert_outcomes(result, 2, 0, 0, xfailed=1)
+
+
+def test_verdict_memoized_per_issue():
+    from pytest_jira import JiraHooks, JiraMarkerReporter
+
+    hooks = JiraHooks(None, JiraMarkerReporter("open", True, None))
+    evaluated = []
+    evaluate = hooks._evaluate
+
+    def counting_evaluate(issue_id):
+        evaluated.append(issue_id)
+        return evaluate(issue_id)
+
+    hooks._evaluate = counting_evaluate
+    hooks.issue_cache["ORG-1"] = {"status": "open"}
+    assert [hooks.is_issue_resolved("ORG-1") for _ in range(100)] == [
+        False
+    ] * 100
+    assert evaluated == ["ORG-1"]
+
+    # Replacing the cached issue invalidates its verdict
+    hooks.issue_cache["ORG-1"] = {"status": "closed"}
+    assert hooks.is_issue_resolved("ORG-1") is True
+    assert evaluated == ["ORG-1", "ORG-1"]
+
+
+def test_run_marks_shared_between_items(testdir):
+    testdir.makeconftest(CONFTEST)
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1382")
+        @pytest.mark.parametrize("i", range(3))
+        def test_xfail(i):
+            assert False
+
+        @pytest.mark.jira("ORG-1382", run=False)
+        def test_skip():
+            assert False
+        """
+    )
+    items, _ = testdir.inline_genitems(*PLUGIN_ARGS)
+    xfail = [item.get_closest_marker("xfail") for item in items[:3]]
+    assert xfail[0] is xfail[1] is xfail[2]
+    assert xfail[0].kwargs["reason"].endswith("/browse/ORG-1382")
+    assert items[3].get_closest_marker("xfail") is None
+    assert items[3].get_closest_marker("skip").kwargs["reason"] == (
+        xfail[0].kwargs["reason"]
+    )
+
+
+def test_jira_issues_parsed_once_per_function(testdir):
+    testdir.makeconftest(CONFTEST)
+    testdir.makepyfile(
+        """
+        import pytest
+
+        pytestmark = pytest.mark.jira("ORG-1412")
+
+        @pytest.mark.parametrize("i", range(5))
+        def test_docstring(i):
+            \"\"\"ORG-1382\"\"\"
+
+        class TestClass:
+            @pytest.mark.jira("ORG-1510")
+            @pytest.mark.parametrize("i", range(5))
+            def test_method(self, i):
+                pass
+
+        @pytest.mark.parametrize(
+            "i", [1, pytest.param(2, marks=pytest.mark.jira("ORG-1511"))]
+        )
+        def test_param_mark(i):
+            pass
+        """
+    )
+    items, rec = testdir.inline_genitems(*PLUGIN_ARGS)
+    config = rec.getcall("pytest_collection_finish").session.config
+    marker = config.pluginmanager.getplugin("jira_plugin").mark
+    assert len(items) == 12
+    assert len(marker._jira_issues) == 4
+    assert sorted(marker.get_jira_issues(items[0])) == [
+        ("ORG-1382", True),
+        ("ORG-1412", True),
+    ]
+    assert sorted(marker.get_jira_issues(items[-1])) == [
+        ("ORG-1412", True),
+        ("ORG-1511", True),
+    ]
+
+
+def test_collection_benchmark(tmpdir):
+    from bench_collection import run_benchmark
+    from fake_jira import FakeJiraServer, make_corpus
+
+    with FakeJiraServer(make_corpus(20)) as server:
+        result = run_benchmark(
+            str(tmpdir.join("tree")), server, 200, unique_issues=20
+        )
+    assert result["items"] == 200
+    # check_connection and a single batched search
+    assert result["requests"] == 2
+    assert result["collection"] >= result["modifyitems"] > 0
+
+
+class TestFakeJiraFaults:
+    """Resilience of JiraSiteConnection against the local Jira stand-in."""
+
+    @pytest.fixture
+    def conn(self, jira_server):
+        from fake_jira import make_corpus
+
+        from pytest_jira import JiraSiteConnection
+
+        jira_server.issues.update(make_corpus(10, "ORG", seed=1))
+        conn = JiraSiteConnection(jira_server.url, timeout=5)
+        conn.setup_retries(3, 0)
+        return conn
+
+    def issue_requests(self, jira_server):
+        return jira_server.request_paths().count("/rest/api/2/issue/ORG-1")
+
+    def test_rate_limit_retry_after(self, conn, jira_server):
+        jira_server.inject(
+            "rate_limit", path="/rest/api/2/issue", retry_after=1
+        )
+        start = time.time()
+        assert conn.get_issue("ORG-1", False)["status"]
+        assert time.time() - start >= 1
+        assert self.issue_requests(jira_server) == 2
+
+    def test_server_error_burst(self, conn, jira_server):
+        jira_server.inject("server_error", count=2, path="/rest/api/2/issue")
+        assert conn.get_issue("ORG-1", False)["status"]
+        assert self.issue_requests(jira_server) == 3
+
+    def test_server_error_exhausts_retries(self, conn, jira_server):
+        jira_server.inject("server_error", count=4, path="/rest/api/2/issue")
+        with pytest.raises(requests.RequestException):
+            conn.get_issue("ORG-1", False)
+
+    def test_truncated_json_retried(self, conn, jira_server):
+        jira_server.inject("truncate", path="/rest/api/2/issue")
+        assert conn.get_issue("ORG-1", False)["status"]
+        assert self.issue_requests(jira_server) == 2
+
+    def test_slow_drip_body(self, conn, jira_server):
+        jira_server.inject("slow_drip", path="/rest/api/2/issue", delay=0.001)
+        assert conn.get_issue("ORG-1", False)["status"]
+
+    def test_latency_timeout(self, conn, jira_server):
+        conn.timeout = 0.1
+        jira_server.latency = 0.5
+        with pytest.raises(requests.RequestException, match="timed out"):
+            conn.check_connection()
+        # Every try gave up after the timeout
+        assert jira_server.request_paths() == ["/rest/api/2/myself"] * 4
+
+    def test_seeded_corpus(self):
+        from fake_jira import make_corpus
+
+        assert make_corpus(50, seed=3) == make_corpus(50, seed=3)
+        assert make_corpus(50, seed=3) != make_corpus(50, seed=4)
+
+
+class TestJiraStats:
+    @pytest.fixture
+    def conn(self, jira_server):
+        from fake_jira import make_corpus
+
+        from pytest_jira import JiraSiteConnection, JiraStats
+
+        jira_server.issues.update(make_corpus(10, "ORG", seed=1))
+        conn = JiraSiteConnection(jira_server.url, timeout=5, stats=JiraStats())
+        conn.setup_retries(3, 0)
+        return conn
+
+    def test_requests_counted(self, conn, jira_server):
+        jira_server.inject("server_error", path="/rest/api/2/issue")
+        conn.get_issue("ORG-1", False)
+        conn.get_issues(["ORG-1", "ORG-2"], False)
+        with pytest.raises(requests.HTTPError):
+            conn.get_issue("ORG-404", False)
+
+        stats = conn.stats
+        assert stats.requests == 4
+        assert stats.retries == 1
+        assert stats.not_found == 1
+        assert stats.errors == 0
+        assert stats.bytes_received > 0
+        labels = sorted(label for _, label in stats.latencies)
+        assert labels == ["ORG-1", "ORG-404", "myself", "search (2 issues)"]
+
+    def test_json_retries_counted(self, conn, jira_server):
+        jira_server.inject("truncate", path="/rest/api/2/issue")
+        conn.get_issue("ORG-1", False)
+        assert conn.stats.requests == 3
+        assert conn.stats.retries == 1
+
+    def test_percentiles(self):
+        from pytest_jira import JiraStats
+
+        stats = JiraStats()
+        assert stats.percentile(50) == 0.0
+        for i in range(1, 101):
+            stats.record_request("ORG-%d" % i, i / 100.0, 200)
+        assert stats.percentile(50) == 0.5
+        assert stats.percentile(95) == 0.95
+        assert stats.percentile(99) == 0.99
+        assert stats.slowest(2) == [(1.0, "ORG-100"), (0.99, "ORG-99")]
+
+    def test_terminal_summary(self, testdir, jira_server):
+        from fake_jira import make_issue
+
+        jira_server.issues["ORG-1"] = make_issue()
+        testdir.makepyfile(
+            """
+            import pytest
+
+            @pytest.mark.jira("ORG-1", run=False)
+            @pytest.mark.parametrize("i", range(3))
+            def test_skip(i):
+                pass
+            """
+        )
+        result = testdir.runpytest(
+            "--jira",
+            "--jira-url",
+            jira_server.url,
+            "--jira-stats",
+            "--jira-stats-threshold",
+            "0",
+        )
+        result.assert_outcomes(skipped=3)
+        result.stdout.fnmatch_lines(
+            [
+                "*Resolving Jira issues took *s, more than the threshold of 0s",
+                "*- Jira statistics -*",
+                "requests: 2, retries: 0, errors: 0, not found: 0, *",
+                "lookups: 3 cache hits, 0 cache misses",
+                "latency: p50 *",
+                "slowest requests:",
+                "  *s search (1 issues)",
+            ]
+        )
+
+    def test_merge(self):
+        from pytest_jira import JiraStats
+
+        stats, worker = JiraStats(), JiraStats()
+        stats.record_request("ORG-1", 0.5, 200)
+        worker.record_request("ORG-2", 1.0, 404)
+        worker.record_lookup(True)
+        worker.record_throttle(4)
+        worker.phase_time = 2.0
+        stats.merge(json.loads(json.dumps(worker.export())))
+        assert stats.requests == 2
+        assert stats.not_found == 1
+        assert stats.cache_hits == 1
+        assert stats.throttled == 1
+        assert stats.concurrency_limit == 4
+        assert stats.phase_time == 2.0
+        assert stats.slowest() == [(1.0, "ORG-2"), (0.5, "ORG-1")]
+
+    def test_xdist_summary(self, testdir, jira_server):
+        pytest.importorskip("xdist")
+        from fake_jira import make_issue
+
+        jira_server.issues["ORG-1"] = make_issue()
+        testdir.makepyfile(
+            """
+            import pytest
+
+            @pytest.mark.jira("ORG-1", run=False)
+            @pytest.mark.parametrize("i", range(4))
+            def test_skip(i):
+                pass
+            """
+        )
+        result = testdir.runpytest_subprocess(
+            "--jira", "--jira-url", jira_server.url, "--jira-stats", "-n", "2"
+        )
+        result.assert_outcomes(skipped=4)
+        # The issue is resolved once, both workers collect all items
+        result.stdout.fnmatch_lines(
+            [
+                "*- Jira statistics -*",
+                "requests: 2, retries: 0, errors: 0, not found: 0, *",
+                "lookups: 8 cache hits, 0 cache misses",
+                "  *s search (1 issues)",
+            ]
+        )
+
+
+def test_trace(testdir, jira_server):
+    from fake_jira import make_issue
+
+    jira_server.issues["ORG-1"] = make_issue()
+    jira_server.inject("server_error", path="/rest/api/2/search")
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1", run=False)
+        @pytest.mark.parametrize("i", range(3))
+        def test_skip(i):
+            pass
+        """
+    )
+    trace = testdir.tmpdir.join("trace.json")
+    result = testdir.runpytest(
+        "--jira",
+        "--jira-url",
+        jira_server.url,
+        "--jira-connection-retry-backoff-factor",
+        "0",
+        "--jira-trace",
+        str(trace),
+    )
+    result.assert_outcomes(skipped=3)
+    events = json.loads(trace.read())["traceEvents"]
+    assert all(e["ph"] in ("X", "M") for e in events)
+    spans = [(e["cat"], e["name"]) for e in events if e["ph"] == "X"]
+    assert ("hook", "pytest_collection_modifyitems") in spans
+    assert ("resolve", "prefetch_issues") in spans
+    assert ("http", "GET myself") in spans
+    assert ("http", "GET search (1 issues)") in spans
+    assert ("retry", "retry backoff") in spans
+    assert spans.count(("cache", "lookup ORG-1")) == 3
+    modifyitems = next(
+        e for e in events if e["name"] == "pytest_collection_modifyitems"
+    )
+    search = next(e for e in events if e["name"] == "GET search (1 issues)")
+    assert modifyitems["ts"] <= search["ts"]
+    assert search["ts"] + search["dur"] <= (
+        modifyitems["ts"] + modifyitems["dur"]
+    )
+
+
+def test_trace_xdist(testdir, jira_server):
+    pytest.importorskip("xdist")
+    from fake_jira import make_issue
+
+    jira_server.issues["ORG-1"] = make_issue()
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1", run=False)
+        @pytest.mark.parametrize("i", range(4))
+        def test_skip(i):
+            pass
+        """
+    )
+    result = testdir.runpytest_subprocess(
+        "--jira",
+        "--jira-url",
+        jira_server.url,
+        "--jira-trace",
+        "trace.json",
+        "-n",
+        "2",
+    )
+    result.assert_outcomes(skipped=4)
+    # The trace of the controller and one for every worker
+    assert sorted(p.basename for p in testdir.tmpdir.listdir("trace*")) == [
+        "trace-gw0.json",
+        "trace-gw1.json",
+        "trace.json",
+    ]
+
+
+def test_trace_disabled():
+    from pytest_jira import JiraHooks, JiraMarkerReporter
+
+    hooks = JiraHooks(None, JiraMarkerReporter("open", True, None))
+    assert hooks.is_issue_resolved.__func__ is JiraHooks.is_issue_resolved
+
+
+@pytest.mark.parametrize("deferred", [False, True])
+def test_resolve_after_deselect(testdir, jira_server, deferred):
+    from fake_jira import make_issue
+
+    jira_server.issues["ORG-1"] = make_issue()
+    jira_server.issues["ORG-2"] = make_issue()
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1", run=False)
+        def test_one():
+            pass
+
+        @pytest.mark.jira("ORG-2", run=False)
+        def test_two():
+            pass
+        """
+    )
+    args = ["--jira", "--jira-url", jira_server.url, "-k", "test_one"]
+    if deferred:
+        args.append("--jira-resolve-after-deselect")
+    result = testdir.runpytest(*args)
+    result.assert_outcomes(skipped=1)
+    searches = [
+        query["jql"][0]
+        for path, query, _ in jira_server.requests
+        if path == "/rest/api/2/search"
+    ]
+    if deferred:
+        assert searches == ['key in ("ORG-1")']
+    else:
+        assert searches == ['key in ("ORG-1","ORG-2")']
+
+
+def test_fetch_during_collection(testdir, jira_server):
+    from fake_jira import make_issue
+
+    for i in range(1, 4):
+        jira_server.issues["ORG-%d" % i] = make_issue()
+    testdir.makeconftest(
+        """
+        import pytest
+
+        @pytest.hookimpl(tryfirst=True)
+        def pytest_collection_modifyitems(config):
+            plugin = config.pluginmanager.getplugin("jira_plugin")
+            # The first item dispatched a fetch as soon as it was collected
+            plugin._background[0].result()
+            assert "ORG-1" in plugin.issue_cache
+        """
+    )
+    testdir.makepyfile(
+        test_one="""
+        import pytest
+
+        @pytest.mark.jira("ORG-1", run=False)
+        def test_one():
+            pass
+        """,
+        test_two="""
+        import pytest
+
+        @pytest.mark.jira("ORG-2", run=False)
+        def test_two():
+            pass
+
+        @pytest.mark.jira("ORG-3", run=False)
+        def test_three():
+            pass
+        """,
+    )
+    result = testdir.runpytest(
+        "--jira",
+        "--jira-url",
+        jira_server.url,
+        "--jira-fetch-during-collection",
+    )
+    result.assert_outcomes(skipped=3)
+    searched = [
+        re.findall(r"ORG-\d", query["jql"][0])
+        for path, query, _ in jira_server.requests
+        if path == "/rest/api/2/search"
+    ]
+    assert searched[0] == ["ORG-1"]
+    assert sorted(sum(searched, [])) == ["ORG-1", "ORG-2", "ORG-3"]
+
+
+class TestJiraCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        from pytest_jira import JiraCircuitBreaker, JiraCircuitOpenError
+
+        breaker = JiraCircuitBreaker(3, 1, 60)
+        for _ in range(3):
+            breaker.check()
+            breaker.record(False)
+        assert breaker.state == "open"
+        with pytest.raises(JiraCircuitOpenError):
+            breaker.check()
+
+    def test_opens_on_error_rate(self):
+        from pytest_jira import BREAKER_WINDOW, JiraCircuitBreaker
+
+        breaker = JiraCircuitBreaker(100, 0.5, 60)
+        for i in range(BREAKER_WINDOW - 1):
+            breaker.record(i % 2 == 0)
+        assert breaker.state == "closed"
+        breaker.record(False)
+        assert breaker.state == "open"
+
+    def test_half_open_probe(self):
+        from pytest_jira import JiraCircuitBreaker, JiraCircuitOpenError
+
+        breaker = JiraCircuitBreaker(1, 1, 0)
+        breaker.record(False)
+        # A single probe is let through
+        breaker.check()
+        assert breaker.state == "half-open"
+        with pytest.raises(JiraCircuitOpenError):
+            breaker.check()
+        breaker.record(False)
+        assert breaker.state == "open"
+        breaker.check()
+        breaker.record(True)
+        assert breaker.state == "closed"
+        breaker.check()
+
+    def test_connection_fails_fast(self, jira_server):
+        from fake_jira import make_corpus
+
+        from pytest_jira import (
+            JiraCircuitBreaker,
+            JiraCircuitOpenError,
+            JiraSiteConnection,
+        )
+
+        jira_server.issues.update(make_corpus(10, "ORG"))
+        breaker = JiraCircuitBreaker(2, 1, 60)
+        conn = JiraSiteConnection(jira_server.url, breaker=breaker)
+        conn.setup_retries(0, 0)
+        conn.check_connection()
+        # Not found issues do not count as failures
+        with pytest.raises(requests.HTTPError):
+            conn.get_issue("ORG-404", False)
+        jira_server.inject("server_error", count=2, path="/rest/api/2/issue")
+        for issue_id in "ORG-1", "ORG-2":
+            with pytest.raises(requests.RequestException):
+                conn.get_issue(issue_id, False)
+        requests_made = len(jira_server.requests)
+        with pytest.raises(JiraCircuitOpenError):
+            conn.get_issue("ORG-3", False)
+        assert len(jira_server.requests) == requests_made
+
+        # Jira is back, the probe closes the breaker
+        breaker.reset_timeout = 0
+        assert conn.get_issue("ORG-3", False)["status"]
+        assert breaker.state == "closed"
+
+    def test_plugin_skips_after_outage(self, testdir, jira_server):
+        jira_server.inject("server_error", count=1000)
+        testdir.makepyfile(
+            """
+            import pytest
+
+            @pytest.mark.parametrize("i", range(1, 21))
+            def test_issue(jira_issue, i):
+                jira_issue("ORG-%d" % i)
+            """
+        )
+        result = testdir.runpytest(
+            "--jira",
+            "--jira-url",
+            jira_server.url,
+            "--jira-connection-retry-total",
+            "0",
+            "--jira-connection-error-strategy",
+            "skip",
+            "--jira-breaker-failures",
+            "3",
+        )
+        result.assert_outcomes(skipped=20)
+        assert len(jira_server.requests) == 3
+        result.stdout.no_fnmatch_line("*Traceback*")
+
+
+class TestJiraRateLimiter:
+    def test_aimd(self):
+        from pytest_jira import JiraRateLimiter
+
+        limiter = JiraRateLimiter(8)
+        limiter.acquire()
+        limiter.release(200)
+        assert limiter.limit == 8
+        for expected in 4, 2, 1, 1:
+            limiter.acquire()
+            limiter.release(429, {"Retry-After": "0"})
+            assert limiter.limit == expected
+        # Grows by one after as many successes as the limit
+        for _ in range(3):
+            limiter.acquire()
+            limiter.release(200)
+        assert limiter.limit == 3
+        # Neither failed requests nor other errors change the limit
+        limiter.acquire()
+        limiter.release()
+        limiter.acquire()
+        limiter.release(404)
+        assert limiter.limit == 3
+        assert limiter.throttled == 4
+
+    def test_in_flight_bounded(self):
+        import threading
+
+        from pytest_jira import JiraRateLimiter
+
+        limiter = JiraRateLimiter(3)
+        lock = threading.Lock()
+        in_flight = []
+
+        def request():
+            limiter.acquire()
+            with lock:
+                in_flight.append(limiter.in_flight)
+            time.sleep(0.01)
+            limiter.release(200)
+
+        threads = [threading.Thread(target=request) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert max(in_flight) == 3
+        assert limiter.in_flight == 0
+
+    def test_retry_after_pauses_everyone(self):
+        from pytest_jira import JiraRateLimiter
+
+        limiter = JiraRateLimiter(4)
+        limiter.acquire()
+        limiter.release(429, {"Retry-After": "0.3"})
+        start = time.monotonic()
+        limiter.acquire()
+        assert time.monotonic() - start >= 0.3
+
+    def test_rate_limit_headers(self):
+        from datetime import datetime, timedelta, timezone
+
+        from pytest_jira import JiraRateLimiter
+
+        limiter = JiraRateLimiter(4)
+        limiter.acquire()
+        limiter.release(200, {"X-RateLimit-Remaining": "10"})
+        assert not limiter.paused_until
+        reset = datetime.now(timezone.utc) + timedelta(seconds=60)
+        limiter.acquire()
+        limiter.release(
+            200,
+            {
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": reset.isoformat(),
+            },
+        )
+        assert limiter.paused_until - time.monotonic() > 50
+        assert limiter.limit == 4
+
+    @pytest.mark.parametrize(
+        "value, expected",
+        [
+            ("3", 3),
+            ("1.5", 1.5),
+            ("timestamp", 3),
+            ("Thu, 01 Jan 1970 00:00:00 GMT", 0),
+            ("2000-01-01T00:00Z", 0),
+            ("soon", None),
+            (None, None),
+        ],
+    )
+    def test_retry_after(self, value, expected):
+        from pytest_jira import _retry_after
+
+        if value == "timestamp":
+            value = str(int(time.time()) + 3)
+        if expected is None:
+            assert _retry_after(value) is None
+        else:
+            assert _retry_after(value) == pytest.approx(expected, abs=1.5)
+
+    def test_connection_retries_throttled(self, jira_server):
+        from fake_jira import make_corpus
+
+        from pytest_jira import JiraRateLimiter, JiraSiteConnection
+
+        jira_server.issues.update(make_corpus(10, "ORG"))
+        limiter = JiraRateLimiter(4)
+        conn = JiraSiteConnection(jira_server.url, limiter=limiter)
+        conn.setup_retries(3, 0)
+        conn.check_connection()
+        jira_server.inject(
+            "rate_limit", path="/rest/api/2/issue", retry_after=0
+        )
+        # The 429 is retried by urllib3 and still seen by the limiter
+        assert conn.get_issue("ORG-1", False)["status"]
+        assert limiter.throttled == 1
+        assert limiter.limit == 2
+        assert limiter.in_flight == 0
+
+    def test_async_fetch_throttled(self, jira_server):
+        pytest.importorskip("aiohttp")
+        from fake_jira import make_corpus
+
+        from pytest_jira import (
+            JiraAsyncFetcher,
+            JiraRateLimiter,
+            JiraSiteConnection,
+        )
+
+        jira_server.issues.update(make_corpus(20, "ORG"))
+        limiter = JiraRateLimiter(8)
+        conn = JiraSiteConnection(jira_server.url, limiter=limiter)
+        conn.setup_retries(3, 0)
+        jira_server.inject(
+            "rate_limit", count=2, path="/rest/api/2/issue", retry_after=0
+        )
+        results = JiraAsyncFetcher(conn, 8).fetch(
+            ["ORG-%d" % i for i in range(1, 21)], False
+        )
+        assert all(result["status"] for result in results.values())
+        assert limiter.throttled == 2
+        assert limiter.in_flight == 0
+
+    def test_plugin_reports_throttling(self, testdir, jira_server):
+        from fake_jira import make_corpus
+
+        jira_server.issues.update(make_corpus(20, "ORG"))
+        jira_server.inject(
+            "rate_limit", path="/rest/api/2/issue", retry_after=0
+        )
+        testdir.makepyfile(
+            """
+            import pytest
+
+            @pytest.mark.parametrize("i", range(1, 21))
+            def test_issue(jira_issue, i):
+                jira_issue("ORG-%d" % i)
+            """
+        )
+        result = testdir.runpytest(
+            "--jira",
+            "--jira-url",
+            jira_server.url,
+            "--jira-disable-prefetch",
+            "--jira-workers",
+            "4",
+            "--jira-stats",
+        )
+        result.assert_outcomes(passed=20)
+        result.stdout.fnmatch_lines(
+            ["*throttled: 1 times, concurrency limit: 2*"]
+        )
+
+
+def test_negative_cache(testdir, jira_server):
+    from fake_jira import make_issue
+
+    jira_server.issues["ORG-1"] = make_issue()
+    jira_server.inject(
+        "server_error", path="/rest/api/2/issue/ORG-403", status=403
+    )
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        def test_open():
+            assert False
+
+        @pytest.mark.jira("ORG-404")
+        def test_missing():
+            assert False
+
+        @pytest.mark.jira("ORG-403")
+        def test_forbidden():
+            pass
+        """
+    )
+    args = (
+        "--jira",
+        "--jira-url",
+        jira_server.url,
+        "--jira-connection-error-strategy",
+        "skip",
+        "--jira-negative-cache-ttl",
+        "3600",
+        "-rs",
+    )
+    result = testdir.runpytest(*args)
+    result.assert_outcomes(xfailed=2, skipped=1)
+    paths = jira_server.request_paths()
+    assert "/rest/api/2/issue/ORG-404" in paths
+    assert "/rest/api/2/issue/ORG-403" in paths
+
+    # Missing issues are answered by the cache, existing ones are not cached
+    del jira_server.requests[:]
+    result = testdir.runpytest(*args)
+    result.assert_outcomes(xfailed=2, skipped=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*403 Error: Forbidden (remembered by the persistent cache) "
+            "for url: *ORG-403*"
+        ]
+    )
+    assert jira_server.request_paths() == [
+        "/rest/api/2/myself",
+        "/rest/api/2/search",
+    ]
+
+    # The strategy for missing issues still applies
+    result = testdir.runpytest(*(args + ("--jira-marker-strategy", "strict")))
+    result.stdout.fnmatch_lines(["*`ORG-404` was not found*"])
+
+    del jira_server.requests[:]
+    result = testdir.runpytest(*(args + ("--jira-cache-clear",)))
+    # ORG-403 is not forbidden anymore but does not exist either
+    result.assert_outcomes(xfailed=2, xpassed=1)
+    assert "/rest/api/2/issue/ORG-404" in jira_server.request_paths()
+
+
+def test_persistent_cache_per_identity(testdir, jira_server):
+    from fake_jira import make_issue
+
+    jira_server.issues["ORG-1"] = make_issue()
+    jira_server.inject(
+        "server_error", path="/rest/api/2/issue/ORG-403", status=403
+    )
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        def test_open():
+            assert False
+
+        @pytest.mark.jira("ORG-403")
+        def test_forbidden():
+            pass
+        """
+    )
+    args = (
+        "--jira",
+        "--jira-url",
+        jira_server.url,
+        "--jira-connection-error-strategy",
+        "skip",
+        "--jira-cache-ttl",
+        "3600",
+        "--jira-negative-cache-ttl",
+        "3600",
+    )
+    result = testdir.runpytest(*(args + ("--jira-token", "old")))
+    result.assert_outcomes(xfailed=1, skipped=1)
+
+    # Lookups of another token are not answered by the cache
+    jira_server.issues["ORG-403"] = make_issue()
+    del jira_server.requests[:]
+    result = testdir.runpytest(*(args + ("--jira-token", "new")))
+    result.assert_outcomes(xfailed=1, xpassed=1)
+
+    del jira_server.requests[:]
+    result = testdir.runpytest(*(args + ("--jira-token", "old")))
+    result.assert_outcomes(xfailed=1, skipped=1)
+    assert jira_server.request_paths() == []
+
+
+def test_persistent_cache_old_schema(tmpdir):
+    import sqlite3
+
+    from pytest_jira import JiraIssueCache
+
+    path = str(tmpdir.join("issues.sqlite"))
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE issues (url TEXT, issue_id TEXT, metadata INTEGER, "
+        "issue TEXT, fetched REAL, PRIMARY KEY (url, issue_id, metadata))"
+    )
+    db.commit()
+    db.close()
+    cache = JiraIssueCache(path, 3600, 3600, identity="user:tester")
+    cache.set_many("http://jira", {"ORG-1": {"status": "open"}}, True)
+    cache.set_missing("http://jira", {"ORG-2": 403})
+    assert cache.get_many("http://jira", ["ORG-1"], True) == {
+        "ORG-1": {"status": "open"}
+    }
+    assert cache.get_missing("http://jira", ["ORG-2"]) == {"ORG-2": 403}
+    cache.close()
+    other = JiraIssueCache(path, 3600, 3600, identity="user:other")
+    assert other.get_many("http://jira", ["ORG-1"], True) == {}
+    assert other.get_missing("http://jira", ["ORG-2"]) == {}
+    other.close()
+
+
+def test_negative_cache_ignores_authentication(testdir, jira_server):
+    from fake_jira import make_issue
+
+    jira_server.issues["ORG-1"] = make_issue()
+    # E.g. a CAPTCHA challenge of Jira
+    jira_server.inject(
+        "server_error", count=10, path="/rest/api/2/myself", status=403
+    )
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        def test_open():
+            assert False
+        """
+    )
+    args = (
+        "--jira",
+        "--jira-url",
+        jira_server.url,
+        "--jira-connection-error-strategy",
+        "skip",
+        "--jira-negative-cache-ttl",
+        "3600",
+    )
+    result = testdir.runpytest(*args)
+    result.assert_outcomes(skipped=1)
+    assert "/rest/api/2/issue/ORG-1" not in jira_server.request_paths()
+
+    # Jira is healthy again, the issue was not remembered as forbidden
+    jira_server.faults[:] = []
+    del jira_server.requests[:]
+    result = testdir.runpytest(*args)
+    result.assert_outcomes(xfailed=1)
+    assert jira_server.request_paths()
+
+
+def test_issue_record():
+    from pytest_jira import JiraSiteConnection, _dump, _load_issue
+
+    field = {
+        "components": [{"name": "com1"}, {"name": "com2"}],
+        "versions": [{"name": "foo-0.1"}],
+        "fixVersions": [],
+        "status": {"name": "Open"},
+        "resolution": None,
+    }
+    issue = JiraSiteConnection._parse_fields(
+        json.loads(json.dumps(field)), False
+    )
+    other = JiraSiteConnection._parse_fields(
+        json.loads(json.dumps(field)), False
+    )
+    assert issue == {
+        "components": {"com1", "com2"},
+        "versions": {"foo-0.1"},
+        "fixed_versions": set(),
+        "status": "open",
+        "resolution": None,
+    }
+    assert issue["status"] == issue.get("status") == "open"
+    assert issue.get("unknown") is None and "unknown" not in issue
+    with pytest.raises(KeyError):
+        issue["unknown"]
+    with pytest.raises(AttributeError):
+        issue.unknown = 1
+    # Equal sets and names are shared between issues
+    assert issue["components"] is other["components"]
+    assert issue["status"] is other["status"]
+    assert _load_issue(_dump(issue), False) == issue
+    assert type(_load_issue(_dump(issue), False)) is type(issue)
+
+
+def test_record_benchmark():
+    from bench_records import measure, parse_dict, parse_record
+    from fake_jira import make_corpus
+
+    responses = [
+        (issue_id, json.dumps({"key": issue_id, "fields": fields}))
+        for issue_id, fields in make_corpus(1000).items()
+    ]
+    assert measure(responses, parse_record) < measure(responses, parse_dict)
+
+
+def test_metadata_schema_reused(monkeypatch):
+    import pytest_jira
+    from pytest_jira import JiraHooks, JiraMarkerReporter
+
+    schema = pytest_jira._issue_schema()
+    dumped = []
+    dump = schema.dump
+    monkeypatch.setattr(
+        schema, "dump", lambda obj: dumped.append(obj) or dump(obj)
+    )
+    hooks = JiraHooks(
+        None, JiraMarkerReporter("open", True, None), return_jira_metadata=True
+    )
+    hooks.issue_cache["ORG-1"] = {"status": {"name": "Open"}}
+    hooks.issue_cache["ORG-2"] = {"status": {"name": "Closed"}}
+    issues = [hooks.is_issue_resolved("ORG-1") for _ in range(100)]
+    assert all(issue is issues[0] for issue in issues)
+    assert issues[0].status == {"name": "Open"}
+    assert hooks.is_issue_resolved("ORG-2").status == {"name": "Closed"}
+    assert len(dumped) == 2
+    assert pytest_jira._issue_schema() is schema
+
+
+def test_metadata_benchmark():
+    from bench_metadata import run
+
+    result = run(10)
+    assert result["memoized lookup"] < result["new schema per lookup"]
+
+
+# Modules which must not be imported while the plugin is not used
+LAZY_MODULES = (
+    "aiohttp",
+    "asyncio",
+    "hashlib",
+    "issue_model",
+    "marshmallow",
+    "orjson",
+    "packaging",
+    "requests",
+    "retry",
+    "six",
+    "sqlite3",
+    "ssl",
+    "urllib3",
+)
+
+
+def imported_modules(code, cwd=None):
+    """
+    Names of all modules imported by `code`, from ``-X importtime`` and
+    ``sys.modules`` (modules imported by importlib are not reported by
+    ``-X importtime``).
+    """
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            code + "\nimport sys; print('--modules--', *sys.modules)",
+        ],
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    modules = set(proc.stdout.split("--modules--", 1)[1].split())
+    return modules.union(
+        line.rsplit("|", 1)[1].strip()
+        for line in proc.stderr.splitlines()
+        if line.startswith("import time:") and "|" in line
+    )
+
+
+def lazy_modules(modules):
+    return sorted(m for m in modules if m.split(".")[0] in LAZY_MODULES)
+
+
+def test_import_is_lazy():
+    modules = imported_modules("import pytest, pytest_jira")
+    assert lazy_modules(modules - imported_modules("import pytest")) == []
+
+
+def test_session_without_jira_is_lazy(testdir):
+    testdir.makepyfile("def test_pass(): pass")
+    code = "import pytest; pytest.main(['--co', '-p', 'no:cacheprovider', %s])"
+    baseline = imported_modules(code % "'-p', 'no:pytest_jira'", testdir.tmpdir)
+    modules = imported_modules(code % "'-p', 'pytest_jira'", testdir.tmpdir)
+    assert "pytest_jira" in modules
+    assert lazy_modules(modules - baseline) == []
+
+
+class TestReadConfig:
+    @pytest.fixture
+    def parsed(self, monkeypatch, tmpdir):
+        import configparser
+
+        import pytest_jira
+
+        monkeypatch.chdir(tmpdir)
+        monkeypatch.delenv("PYTEST_XDIST_WORKER", raising=False)
+        monkeypatch.delenv(pytest_jira.CONFIG_CACHE_ENV_VAR, raising=False)
+        monkeypatch.setattr(pytest_jira, "_config_cache", {})
+        parsed = []
+        read = configparser.ConfigParser.read
+
+        def counting_read(self, filenames, *args):
+            parsed.append(filenames)
+            return read(self, filenames, *args)
+
+        monkeypatch.setattr(configparser.ConfigParser, "read", counting_read)
+        return parsed
+
+    def test_parsed_once_while_unchanged(self, parsed, tmpdir):
+        from pytest_jira import _get_value, _read_config
+
+        tmpdir.join("jira.cfg").write("[DEFAULT]\nurl = http://jira.local\n")
+        config = _read_config(tmpdir)
+        assert _get_value(config, "DEFAULT", "url") == "http://jira.local"
+        assert _read_config(tmpdir).defaults() == config.defaults()
+        assert len(parsed) == 1
+
+        tmpdir.join("jira.cfg").write("[DEFAULT]\nurl = http://other.local\n")
+        config = _read_config(tmpdir)
+        assert _get_value(config, "DEFAULT", "url") == "http://other.local"
+        assert len(parsed) == 2
+
+    def test_worker_inherits_controller_config(
+        self, parsed, tmpdir, monkeypatch
+    ):
+        import pytest_jira
+        from pytest_jira import (
+            CONFIG_CACHE_ENV_VAR,
+            _config_env,
+            _get_bool,
+            _read_config,
+        )
+
+        tmpdir.join("jira.cfg").write("[DEFAULT]\nprefetch = False\n")
+        inherited = json.loads(_config_env(tmpdir))
+        inherited["pid"] = -1
+        monkeypatch.setenv(CONFIG_CACHE_ENV_VAR, json.dumps(inherited))
+        monkeypatch.setenv("PYTEST_XDIST_WORKER", "gw0")
+
+        def no_stat(paths):
+            raise AssertionError("configuration files were checked")
+
+        monkeypatch.setattr(pytest_jira, "_stat_signature", no_stat)
+        config = _read_config(tmpdir)
+        assert _get_bool(config, "DEFAULT", "prefetch", True) is False
+        assert len(parsed) == 1
+
+    def test_worker_reads_other_directory(self, parsed, tmpdir, monkeypatch):
+        from pytest_jira import CONFIG_CACHE_ENV_VAR, _config_env, _read_config
+
+        inherited = json.loads(_config_env(tmpdir))
+        inherited["pid"] = -1
+        monkeypatch.setenv(CONFIG_CACHE_ENV_VAR, json.dumps(inherited))
+        monkeypatch.setenv("PYTEST_XDIST_WORKER", "gw0")
+        other = tmpdir.mkdir("other")
+        other.join("jira.cfg").write("[DEFAULT]\nurl = http://jira.local\n")
+        monkeypatch.chdir(other)
+        assert _read_config(other).defaults()["url"] == "http://jira.local"
+
+    def test_credentials_not_exported(self, parsed, tmpdir):
+        from pytest_jira import CONFIG_CACHE_ENV_VAR, _config_env, _read_config
+
+        tmpdir.join("jira.cfg").write(
+            "[DEFAULT]\nurl = http://jira.local\nusername = user\n"
+            "password = hunter2\ntoken = secret\n"
+        )
+        assert _read_config(tmpdir).defaults()["password"] == "hunter2"
+        assert CONFIG_CACHE_ENV_VAR not in os.environ
+        defaults = json.loads(_config_env(tmpdir))["defaults"]
+        assert defaults == {"url": "http://jira.local"}
+
+
+def test_config_not_in_environment(testdir):
+    testdir.makefile(".cfg", jira="[DEFAULT]\npassword = hunter2\n")
+    testdir.makepyfile(
+        """
+        import os
+        import subprocess
+
+        def test_env():
+            assert "PYTEST_JIRA_CONFIG_CACHE" not in os.environ
+            env = subprocess.check_output(["env"]).decode()
+            assert "hunter2" not in env
+        """
+    )
+    result = testdir.runpytest_subprocess()
+    result.assert_outcomes(passed=1)
+
+
+def test_xdist_workers_get_credentials(testdir, jira_server):
+    pytest.importorskip("xdist")
+    from fake_jira import make_issue
+
+    jira_server.issues["ORG-1"] = make_issue("Closed")
+    testdir.makefile(
+        ".cfg",
+        jira="[DEFAULT]\nurl = %s\nusername = user\npassword = hunter2\n"
+        % jira_server.url,
+    )
+    testdir.makepyfile(
+        """
+        import os
+
+        import pytest
+
+        @pytest.mark.jira("ORG-1")
+        @pytest.mark.parametrize("i", range(4))
+        def test_env(i):
+            assert "PYTEST_JIRA_CONFIG_CACHE" not in os.environ
+        """
+    )
+    result = testdir.runpytest_subprocess("--jira", "-n", "2")
+    result.assert_outcomes(passed=4)
+    assert jira_server.requests
+    assert all(
+        headers["Authorization"].startswith("Basic ")
+        for _, _, headers in jira_server.requests
+    )
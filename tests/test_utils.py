@@ -1,10 +1,10 @@
-import six
+import configparser
 
 from pytest_jira import _get_value
 
 
 def init_config_parser():
-    c = six.moves.configparser.ConfigParser()
+    c = configparser.ConfigParser()
     c.set("DEFAULT", "key", "value")
     return c
 